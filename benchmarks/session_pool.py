@@ -0,0 +1,74 @@
+"""
+Benchmark of the context session pool.
+
+Emulates the session lifecycle of many requests that touch the database:
+    the context session is created, closed and returned to the pool.
+No connection to the database is required, as only the cost of session
+    objects is measured.
+
+python -m benchmarks.session_pool
+"""
+
+import asyncio
+import gc
+import time
+from functools import partial
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from examples.database import create_engine, create_session_maker
+
+REQUESTS = 20_000
+
+
+async def emulate_requests(connect: DBConnect) -> None:
+    for _ in range(REQUESTS):
+        token = init_db_session_ctx()
+        await db_session(connect)
+        await reset_db_session_ctx(token)
+
+
+def _count_collections(
+    collections: list[str], phase: str, _info: dict[str, int]
+) -> None:
+    if phase == "start":
+        collections.append(phase)
+
+
+async def measure(session_pool_size: int) -> str:
+    connect = DBConnect(
+        engine_creator=create_engine,
+        session_maker_creator=create_session_maker,
+        host="127.0.0.1",
+        session_pool_size=session_pool_size,
+    )
+    await connect.session_maker()  # the engine is not part of the benchmark
+
+    gc.collect()
+    collections: list[str] = []
+    callback = partial(_count_collections, collections)
+    gc.callbacks.append(callback)
+    started = time.perf_counter()
+    await emulate_requests(connect)
+    elapsed = time.perf_counter() - started
+    gc.callbacks.remove(callback)
+    await connect.close()
+
+    return (
+        f"session_pool_size={session_pool_size}: "
+        f"{elapsed / REQUESTS * 1_000_000:.1f}us per request, "
+        f"{len(collections)} gc collections"
+    )
+
+
+async def main() -> None:
+    for session_pool_size in (0, 1):
+        print(await measure(session_pool_size))  # noqa: T201
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
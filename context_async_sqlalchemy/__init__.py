@@ -6,18 +6,48 @@ from .auto_commit import (
     auto_commit_by_status_code,
     close_all_sessions,
     commit_all_sessions,
+    invalidate_all_sessions,
     rollback_all_sessions,
 )
+from .batch import DBBatch, db_batch
+from .bulk import (
+    copy_rows,
+    upsert_rows,
+    upsert_rows_returning,
+    write_in_chunks,
+)
+from .caching import CACHE_RESULT, IdentityCache, ResultCache
 from .connect import DBConnect
 from .context import (
     ContextAlreadyInitiatedError,
     ContextNotInitiatedError,
+    finalize_db_session_ctx,
     get_db_session_from_context,
     init_db_session_ctx,
     is_context_initiated,
     pop_db_session_from_context,
     put_db_session_to_context,
     reset_db_session_ctx,
+    set_autocommit_read_ctx,
+    set_deadline_ctx,
+    set_read_only_ctx,
+)
+from .deadline import DeadlineExceededError
+from .finalization import SessionsFinalizationError
+from .idle import IdleInTransactionError
+from .lazy_loads import batched_lazy_loads
+from .leaks import (
+    ContextFinalizedError,
+    late_sessions_count,
+    leaked_sessions_count,
+)
+from .loader import ContextLoader, context_loader
+from .notify import InvalidationListener
+from .retry import (
+    is_retryable_error,
+    retry_atomic_db_session,
+    retry_counters,
+    retry_in_new_ctx,
 )
 from .run_in_new_context import run_in_new_ctx
 from .session import (
@@ -26,32 +56,72 @@ from .session import (
     commit_db_session,
     db_session,
     new_non_ctx_atomic_session,
+    new_non_ctx_read_only_session,
     new_non_ctx_session,
     rollback_db_session,
 )
+from .writes import (
+    ANY_TABLE,
+    READ_STATEMENT,
+    session_has_writes,
+    written_tables,
+)
 
 __all__ = [
+    "ANY_TABLE",
+    "CACHE_RESULT",
+    "READ_STATEMENT",
     "ASGIHTTPDBSessionMiddleware",
     "BeforeCommitCallback",
     "ContextAlreadyInitiatedError",
+    "ContextFinalizedError",
+    "ContextLoader",
     "ContextNotInitiatedError",
+    "DBBatch",
     "DBConnect",
+    "DeadlineExceededError",
+    "IdentityCache",
+    "IdleInTransactionError",
+    "InvalidationListener",
+    "ResultCache",
+    "SessionsFinalizationError",
     "atomic_db_session",
     "auto_commit_by_status_code",
+    "batched_lazy_loads",
     "close_all_sessions",
     "close_db_session",
     "commit_all_sessions",
     "commit_db_session",
+    "context_loader",
+    "copy_rows",
+    "db_batch",
     "db_session",
+    "finalize_db_session_ctx",
     "get_db_session_from_context",
     "init_db_session_ctx",
+    "invalidate_all_sessions",
     "is_context_initiated",
+    "is_retryable_error",
+    "late_sessions_count",
+    "leaked_sessions_count",
     "new_non_ctx_atomic_session",
+    "new_non_ctx_read_only_session",
     "new_non_ctx_session",
     "pop_db_session_from_context",
     "put_db_session_to_context",
     "reset_db_session_ctx",
+    "retry_atomic_db_session",
+    "retry_counters",
+    "retry_in_new_ctx",
     "rollback_all_sessions",
     "rollback_db_session",
     "run_in_new_ctx",
+    "session_has_writes",
+    "set_autocommit_read_ctx",
+    "set_deadline_ctx",
+    "set_read_only_ctx",
+    "upsert_rows",
+    "upsert_rows_returning",
+    "write_in_chunks",
+    "written_tables",
 ]
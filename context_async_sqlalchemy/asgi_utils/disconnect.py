@@ -0,0 +1,65 @@
+import asyncio
+from collections.abc import Awaitable, Callable, MutableMapping
+from typing import Any
+
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Scope = MutableMapping[str, Any]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+class ClientDisconnectedError(Exception):
+    """The client disconnected before the response was sent"""
+
+
+async def run_until_disconnect(
+    app: ASGIApp,
+    scope: Scope,
+    receive: Receive,
+    send: Send,
+) -> None:
+    """
+    Runs the app and cancels it if the client disconnects before
+        the response is sent. In that case, ClientDisconnectedError is
+        raised once the app is cancelled.
+
+    Messages are read from receive in the background and passed to the app
+        in the same order, so that the disconnect is noticed even while
+        the app is waiting for the database.
+    """
+    messages: asyncio.Queue[Message] = asyncio.Queue()
+    response_sent = False
+    disconnected = False
+
+    async def send_wrapper(message: Message) -> None:
+        nonlocal response_sent
+        await send(message)
+        if message["type"] == "http.response.body" and not message.get(
+            "more_body", False
+        ):
+            response_sent = True
+
+    app_task = asyncio.ensure_future(app(scope, messages.get, send_wrapper))
+
+    async def watch() -> None:
+        nonlocal disconnected
+        while True:
+            message = await receive()
+            messages.put_nowait(message)
+            if message["type"] == "http.disconnect":
+                # Background work after the response is not cancelled
+                if not response_sent:
+                    disconnected = True
+                    app_task.cancel()
+                return
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        await app_task
+    except asyncio.CancelledError:
+        if disconnected:
+            raise ClientDisconnectedError("Client disconnected") from None
+        raise
+    finally:
+        watcher.cancel()
@@ -1,17 +1,25 @@
 from collections.abc import Awaitable, Callable, MutableMapping
+from contextvars import Token
 from http import HTTPStatus
 from typing import Any
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from ..auto_commit import (
     BeforeCommitCallback,
     auto_commit_by_status_code,
+    invalidate_all_sessions,
     rollback_all_sessions,
 )
 from ..context import (
+    finalize_db_session_ctx,
     init_db_session_ctx,
     is_context_initiated,
-    reset_db_session_ctx,
+    set_deadline_ctx,
+    set_request_scope_ctx,
 )
+from ..deadline import request_timeout
+from .disconnect import ClientDisconnectedError, run_until_disconnect
 
 Message = MutableMapping[str, Any]
 Receive = Callable[[], Awaitable[Message]]
@@ -27,9 +35,42 @@ class ASGIHTTPDBSessionMiddleware:
         self,
         app: ASGIApp,
         before_commit: BeforeCommitCallback | None = None,
+        concurrent_finalization: bool = False,
+        two_phase_commit: bool = False,
+        timeout: float | None = None,
+        timeout_header: str | None = None,
+        cancel_on_disconnect: bool = False,
     ):
+        """
+        concurrent_finalization: commit, roll back and close sessions
+            of different connections concurrently
+            (see DBConnect commit_order)
+
+        two_phase_commit: commit sessions of different connections
+            atomically using two-phase commit (see commit_all_sessions)
+
+        timeout: the time budget of a request in seconds
+            (see set_deadline_ctx)
+
+        timeout_header: the name of the header with the time budget of
+            a request in milliseconds. The smaller of the header value and
+            timeout is used.
+
+        cancel_on_disconnect: cancel the handler if the client disconnects
+            before the response is sent. The driver cancels the running
+            statement on the server, and the sessions are rolled back.
+        """
         self.app = app
         self._before_commit = before_commit
+        self._concurrently = concurrent_finalization
+        self._two_phase = two_phase_commit
+        self._timeout = timeout
+        self._timeout_header = (
+            timeout_header.lower().encode("latin-1")
+            if timeout_header
+            else None
+        )
+        self._cancel_on_disconnect = cancel_on_disconnect
 
     async def __call__(
         self, scope: Scope, receive: Receive, send: Send
@@ -59,6 +100,10 @@ class ASGIHTTPDBSessionMiddleware:
         # the container itself is shared, and this coroutine will
         # add the session to container = shared context.
         token = init_db_session_ctx()
+        set_request_scope_ctx(scope)
+        timeout = request_timeout(self._timeout, self._header_value(scope))
+        if timeout is not None:
+            set_deadline_ctx(timeout)
 
         status_code = HTTPStatus.INTERNAL_SERVER_ERROR
 
@@ -68,18 +113,62 @@ class ASGIHTTPDBSessionMiddleware:
                 status_code = message["status"]
             await send(message)
 
-        try:
-            await self.app(scope, receive, send_wrapper)
+        async def commit_or_rollback() -> None:
             # using the status code, we decide to commit or rollback
             # all sessions
             await auto_commit_by_status_code(
                 status_code=status_code,
                 before_commit=self._before_commit,
+                concurrently=self._concurrently,
+                two_phase=self._two_phase,
             )
-        except Exception:
+
+        # Finalization closes all sessions and clears the context.
+        # It is shielded from cancellation, so that no session is left
+        # with a checked out connection.
+        try:
+            await self._run_app(scope, receive, send_wrapper)
+        except ClientDisconnectedError:
+            # Nobody waits for the response anymore
+            await self._finalize(token, self._discard_sessions)
+        except BaseException:
             # If an exception occurs, we roll all sessions back
-            await rollback_all_sessions()
+            await self._finalize(token, self._rollback_sessions)
             raise
-        finally:
-            # Close all sessions and clear the context
-            await reset_db_session_ctx(token)
+        else:
+            await self._finalize(token, commit_or_rollback)
+
+    async def _run_app(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if self._cancel_on_disconnect:
+            await run_until_disconnect(self.app, scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _finalize(
+        self,
+        token: Token[dict[str, AsyncSession] | None],
+        finalize: Callable[[], Awaitable[None]],
+    ) -> None:
+        await finalize_db_session_ctx(
+            token, finalize, concurrently=self._concurrently
+        )
+
+    async def _rollback_sessions(self) -> None:
+        await rollback_all_sessions(concurrently=self._concurrently)
+
+    async def _discard_sessions(self) -> None:
+        try:
+            await rollback_all_sessions(concurrently=self._concurrently)
+        except Exception:
+            # The connections are in an unknown state after cancellation
+            await invalidate_all_sessions(concurrently=self._concurrently)
+
+    def _header_value(self, scope: Scope) -> str | None:
+        if self._timeout_header is None:
+            return None
+        for name, value in scope.get("headers", ()):
+            if name == self._timeout_header:
+                return str(value.decode("latin-1"))
+        return None
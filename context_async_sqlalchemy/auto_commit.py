@@ -2,9 +2,14 @@ from collections.abc import Callable, Coroutine
 from http import HTTPStatus
 from typing import Any
 
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
-from .context import sessions_stream
+from .connect import DBConnect
+from .context import session_groups
+from .finalization import finalize_groups
+from .writes import is_read_only_session, session_has_writes
 
 BeforeCommitCallback = Callable[[AsyncSession], Coroutine[Any, Any, None]]
 
@@ -12,6 +17,8 @@ BeforeCommitCallback = Callable[[AsyncSession], Coroutine[Any, Any, None]]
 async def auto_commit_by_status_code(
     status_code: int,
     before_commit: BeforeCommitCallback | None = None,
+    concurrently: bool = False,
+    two_phase: bool = False,
 ) -> None:
     """
     Implements automatic commit or rollback.
@@ -19,46 +26,141 @@ async def auto_commit_by_status_code(
         session lifecycle management.
     """
     if status_code < HTTPStatus.BAD_REQUEST:
-        await commit_all_sessions(before_commit)
+        await commit_all_sessions(before_commit, concurrently, two_phase)
     else:
-        await rollback_all_sessions()
+        await rollback_all_sessions(concurrently)
 
 
-async def rollback_all_sessions() -> None:
+async def rollback_all_sessions(concurrently: bool = False) -> None:
     """
     Rolls back all open context sessions.
 
     It should be used in middleware or anywhere else where you expect
         lifecycle management and need to roll back all opened sessions.
     For example, inside an except block.
+
+    concurrently: roll back sessions with the same commit_order
+        at the same time
     """
-    for session in sessions_stream():
+
+    async def rollback(item: tuple[DBConnect, AsyncSession]) -> None:
+        _, session = item
         if session.in_transaction():
             await session.rollback()
 
+    await finalize_groups(session_groups(), rollback, concurrently)
+
 
 async def commit_all_sessions(
     before_commit: BeforeCommitCallback | None = None,
+    concurrently: bool = False,
+    two_phase: bool = False,
 ) -> None:
     """
     Commits all open context sessions.
 
     It should be used in middleware or anywhere else where you expect
         lifecycle management and need to commit all opened sessions.
+
+    concurrently: commit sessions with the same commit_order at the same
+        time. Groups with a lower commit_order are committed first.
+
+    Read-only sessions and sessions of connections with
+        skip_commit_without_writes that wrote nothing are not committed.
+        Their transactions end when the sessions are closed.
+
+    two_phase: if more than one session has an open transaction, prepare
+        all of them concurrently and only then commit them concurrently.
+        If any session fails to prepare, nothing is committed.
+        The sessions must be created with twophase=True.
     """
-    for session in sessions_stream():
-        if session.in_transaction():
+    if two_phase:
+        await _two_phase_commit(before_commit)
+        return
+
+    async def commit(item: tuple[DBConnect, AsyncSession]) -> None:
+        connect, session = item
+        if _needs_commit(connect, session):
             if before_commit is not None:
                 await before_commit(session)
             await session.commit()
 
+    await finalize_groups(session_groups(), commit, concurrently)
 
-async def close_all_sessions() -> None:
+
+async def close_all_sessions(concurrently: bool = False) -> None:
     """
     Closes all open context sessions.
 
     It should be used in middleware or anywhere else where you expect
         lifecycle management and need to close all sessions.
+
+    concurrently: close sessions with the same commit_order at the same time
     """
-    for session in sessions_stream():
+
+    async def close(item: tuple[DBConnect, AsyncSession]) -> None:
+        _, session = item
         await session.close()
+
+    await finalize_groups(session_groups(), close, concurrently)
+
+
+async def invalidate_all_sessions(concurrently: bool = False) -> None:
+    """
+    Closes all context sessions and invalidates their connections:
+        the connections are closed instead of being returned to the pool.
+
+    Use it when the state of the connections is unknown, for example,
+        if a rollback after a cancelled statement failed.
+    """
+
+    async def invalidate(item: tuple[DBConnect, AsyncSession]) -> None:
+        _, session = item
+        await session.invalidate()
+
+    await finalize_groups(session_groups(), invalidate, concurrently)
+
+
+async def _two_phase_commit(
+    before_commit: BeforeCommitCallback | None,
+) -> None:
+    sessions = [
+        session
+        for group in session_groups()
+        for connect, session in group
+        if _needs_commit(connect, session)
+    ]
+    if len(sessions) < 2:
+        # A single transaction is atomic without the prepare phase
+        await commit_all_sessions(before_commit)
+        return
+
+    if not all(session.sync_session.twophase for session in sessions):
+        raise InvalidRequestError(
+            "Two-phase commit requires sessions created with twophase=True"
+        )
+
+    if before_commit is not None:
+        for session in sessions:
+            await before_commit(session)
+
+    # If the prepare phase fails, the prepared transactions are rolled back
+    # along with the rest when the sessions are rolled back or closed
+    await finalize_groups([sessions], _prepare, concurrently=True)
+    await finalize_groups([sessions], _commit, concurrently=True)
+
+
+def _needs_commit(connect: DBConnect, session: AsyncSession) -> bool:
+    if not session.in_transaction() or is_read_only_session(session):
+        return False
+    if connect.skip_commit_without_writes:
+        return session_has_writes(session)
+    return True
+
+
+async def _prepare(session: AsyncSession) -> None:
+    await session.run_sync(Session.prepare)
+
+
+async def _commit(session: AsyncSession) -> None:
+    await session.commit()
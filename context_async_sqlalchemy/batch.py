@@ -0,0 +1,131 @@
+"""Execution of several statements in a batch on the context session"""
+
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from sqlalchemy import Executable, Insert
+from sqlalchemy.engine import Result
+
+from .connect import DBConnect
+from .session import db_session
+
+
+class DBBatch:
+    """
+    Statements to execute on the context session in the order they were
+        added. See db_batch.
+
+    It is not pipelining: asyncpg can't send different statements at
+        once, so they are executed one by one. Only adjacent inserts of
+        the same statement are joined into one executemany.
+    """
+
+    def __init__(self, connect: DBConnect) -> None:
+        self.connect = connect
+        # The results of the executions, see add
+        self.results: list[Result[Any]] = []
+        self._pending: list[_Execution] = []
+
+    def add(
+        self,
+        statement: Executable,
+        parameters: dict[str, Any] | None = None,
+    ) -> int:
+        """
+        Adds a statement with its parameters to the batch and returns the
+            index of its result in results.
+
+        An INSERT without RETURNING joins the previous statement if it's
+            the same statement object with parameters of the same keys.
+            They are executed at once with all their parameters
+            (executemany), in one round trip, and share the result.
+        """
+        if not self._pending or not self._pending[-1].join(
+            statement, parameters
+        ):
+            self._pending.append(_Execution(statement, parameters))
+        return len(self.results) + len(self._pending) - 1
+
+    async def execute(self) -> list[Result[Any]]:
+        """
+        Executes the added statements and returns the results of the
+            executions in order.
+        """
+        pending, self._pending = self._pending, []
+        session = await db_session(self.connect)
+        results: list[Result[Any]] = []
+        for execution in pending:
+            result = await session.execute(
+                execution.statement, execution.parameters()
+            )
+            self.results.append(result)
+            results.append(result)
+        return results
+
+
+@asynccontextmanager
+async def db_batch(connect: DBConnect) -> AsyncGenerator[DBBatch]:
+    """
+    Collects statements and executes them on the context session at the
+        end of the block, if it raises nothing.
+
+    Adjacent inserts of the same statement with parameters of the same
+        keys are executed with executemany, in one round trip. The other
+        statements are executed one by one.
+
+    example of use:
+        async with db_batch(connect) as batch:
+            batch.add(insert_log, {"message": "first"})
+            batch.add(insert_log, {"message": "second"})
+            index = batch.add(update(Item).values(seen=True))
+        update_result = batch.results[index]
+    """
+    batch = DBBatch(connect)
+    yield batch
+    await batch.execute()
+
+
+class _Execution:
+    """A statement with the parameters it is executed with at once"""
+
+    def __init__(
+        self,
+        statement: Executable,
+        parameters: dict[str, Any] | None,
+    ) -> None:
+        self.statement = statement
+        self.many = [] if parameters is None else [parameters]
+        self.joinable = parameters is not None and is_plain_insert(statement)
+
+    def join(
+        self,
+        statement: Executable,
+        parameters: dict[str, Any] | None,
+    ) -> bool:
+        """Joins the statement with the parameters if it can"""
+        if (
+            not self.joinable
+            or statement is not self.statement
+            or parameters is None
+            # Keys missing from the first parameters would be dropped
+            or parameters.keys() != self.many[0].keys()
+        ):
+            return False
+        self.many.append(parameters)
+        return True
+
+    def parameters(self) -> list[dict[str, Any]] | dict[str, Any] | None:
+        if not self.many:
+            return None
+        if len(self.many) == 1:
+            return self.many[0]
+        return self.many
+
+
+def is_plain_insert(statement: Executable) -> bool:
+    """Whether the statement is an INSERT without RETURNING"""
+    return (
+        isinstance(statement, Insert)
+        and not statement.returning_column_descriptions
+    )
@@ -0,0 +1,311 @@
+"""Bulk writes through a session"""
+
+import asyncio
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Mapping,
+    Sequence,
+)
+from typing import Any, TypeVar, cast
+
+from sqlalchemy import (
+    ColumnElement,
+    Delete,
+    FromClause,
+    Row,
+    Table,
+    Update,
+    insert,
+    select,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import CursorResult, Result
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import QueryableAttribute, class_mapper
+
+from .caching import forget_memoized
+from .connect import DBConnect
+from .idle import idle_watchdog_paused
+from .run_in_new_context import run_in_new_ctx
+from .session import db_session
+from .writes import record_writes
+
+Item = TypeVar("Item")
+
+Rows = Iterable[Sequence[Any]] | AsyncIterable[Sequence[Any]]
+Values = Iterable[Mapping[str, Any]] | AsyncIterable[Mapping[str, Any]]
+
+# Called after every chunk with the number of rows written so far and the
+# last key of the chunk, None after the last chunk
+ChunkProgress = Callable[[int, Any], None]
+
+# The maximum number of parameters of a statement in PostgreSQL
+_MAX_PARAMETERS = 32767
+
+
+async def copy_rows(
+    session: AsyncSession,
+    table: type | FromClause,
+    rows: Rows,
+    columns: Sequence[str] | None = None,
+    chunk_size: int = 1000,
+) -> int:
+    """
+    Inserts the rows into the table (or the table of the model) with
+        binary COPY in the current transaction of the session, and returns
+        their number.
+    The rows are values in the order of the columns, all columns of the
+        table by default. They are streamed, so an iterable or an async
+        iterable of any size can be passed.
+
+    With drivers other than asyncpg the rows are inserted with
+        executemany in chunks of chunk_size rows.
+
+    example of use:
+        session = await db_session(connect)
+        await copy_rows(session, Log, read_logs(), columns=["message"])
+    """
+    target = _table(table)
+    columns = list(columns or target.columns.keys())
+    if session.autoflush:
+        await session.flush()
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection: Any = raw_connection.driver_connection
+
+    if hasattr(driver_connection, "copy_records_to_table"):
+        if not driver_connection.is_in_transaction():
+            # The SQLAlchemy adapter sends BEGIN with the first statement
+            await connection.execute(select(1))
+        # COPY bypasses the cursor events, so its time would seem idle
+        with idle_watchdog_paused(session):
+            status: str = await driver_connection.copy_records_to_table(
+                target.name,
+                records=rows,
+                columns=columns,
+                schema_name=target.schema,
+            )
+        count = int(status.split()[-1])
+    else:
+        count = 0
+        statement = insert(target)
+        async for chunk in _chunks(rows, chunk_size):
+            parameters = [
+                dict(zip(columns, row, strict=True)) for row in chunk
+            ]
+            await session.execute(statement, parameters)
+            count += len(chunk)
+
+    record_writes(session, {target.name})
+    forget_memoized(session, {target.name})
+    return count
+
+
+async def upsert_rows(
+    session: AsyncSession,
+    table: type | FromClause,
+    rows: Values,
+    index_elements: Sequence[str],
+    update_columns: Sequence[str] | None = None,
+    chunk_size: int = 1000,
+) -> int:
+    """
+    Inserts the rows into the table (or the table of the model), updating
+        the rows that conflict with them on index_elements, and returns
+        the number of the passed rows.
+    The rows are dicts by column keys, all with the same keys. They are
+        written in chunks of at most chunk_size rows, so an iterable or an
+        async iterable of any size can be passed.
+    update_columns are updated on conflict, by default all columns of the
+        rows except index_elements. If there are none, the conflicting
+        rows are left as they are.
+
+    example of use:
+        session = await db_session(connect)
+        await upsert_rows(session, Price, prices, index_elements=["sku"])
+    """
+    count = 0
+    async for chunk, _ in _upsert(
+        session, table, rows, index_elements, update_columns, (), chunk_size
+    ):
+        count += len(chunk)
+    return count
+
+
+async def upsert_rows_returning(
+    session: AsyncSession,
+    table: type | FromClause,
+    rows: Values,
+    index_elements: Sequence[str],
+    returning: Sequence[str],
+    update_columns: Sequence[str] | None = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[Row[Any]]:
+    """
+    The same as upsert_rows, but yields the returning columns of the
+        inserted and updated rows, chunk by chunk. The rows that are left
+        as they are on conflict are not returned.
+
+    example of use:
+        async for row in upsert_rows_returning(
+            session, Price, prices, index_elements=["sku"], returning=["id"]
+        ):
+            ...
+    """
+    async for _, result in _upsert(
+        session,
+        table,
+        rows,
+        index_elements,
+        update_columns,
+        returning,
+        chunk_size,
+    ):
+        for row in result:
+            yield row
+
+
+async def _upsert(
+    session: AsyncSession,
+    table: type | FromClause,
+    rows: Values,
+    index_elements: Sequence[str],
+    update_columns: Sequence[str] | None,
+    returning: Sequence[str],
+    chunk_size: int,
+) -> AsyncIterator[tuple[list[Mapping[str, Any]], Result[Any]]]:
+    target = _table(table)
+    # Every row of a chunk is rendered with all columns at most
+    chunk_size = max(
+        1, min(chunk_size, _MAX_PARAMETERS // len(target.columns))
+    )
+    statement = None
+    async for chunk in _chunks(rows, chunk_size):
+        if statement is None:
+            statement = _upsert_statement(
+                target, chunk[0], index_elements, update_columns, returning
+            )
+        yield chunk, await session.execute(statement, chunk)
+
+
+def _upsert_statement(
+    target: Table,
+    row: Mapping[str, Any],
+    index_elements: Sequence[str],
+    update_columns: Sequence[str] | None,
+    returning: Sequence[str],
+) -> Any:
+    statement = pg_insert(target)
+    if update_columns is None:
+        update_columns = [key for key in row if key not in index_elements]
+    if update_columns:
+        upsert = statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={key: statement.excluded[key] for key in update_columns},
+        )
+    else:
+        upsert = statement.on_conflict_do_nothing(
+            index_elements=index_elements
+        )
+    if returning:
+        return upsert.returning(*(target.c[key] for key in returning))
+    return upsert
+
+
+async def write_in_chunks(
+    connect: DBConnect,
+    statement: Update | Delete,
+    key: ColumnElement[Any] | QueryableAttribute[Any],
+    chunk_size: int = 1000,
+    pause: float = 0.0,
+    progress: ChunkProgress | None = None,
+) -> int:
+    """
+    Executes the UPDATE or DELETE statement in chunks by ranges of the key
+        column, each in its own short transaction in a new context, and
+        returns the number of written rows.
+    A range covers chunk_size rows matching the statement, in the order of
+        the key, so the key should be indexed. The chunks are committed
+        one by one: if one fails, the previous ones stay committed.
+    It waits pause seconds between chunks, so that the other transactions
+        can take the locks in between.
+
+    example of use:
+        await write_in_chunks(
+            connect,
+            delete(Event).where(Event.created_at < month_ago),
+            Event.id,
+            chunk_size=5000,
+            pause=0.1,
+            progress=lambda rows, key: logger.info("%d rows deleted", rows),
+        )
+    """
+    last_key = None
+    total = 0
+    while True:
+        last_key, count = await run_in_new_ctx(
+            _write_chunk, connect, statement, key, last_key, chunk_size
+        )
+        total += count
+        if progress is not None:
+            progress(total, last_key)
+        if last_key is None:
+            return total
+        await asyncio.sleep(pause)
+
+
+async def _write_chunk(
+    connect: DBConnect,
+    statement: Update | Delete,
+    key: ColumnElement[Any] | QueryableAttribute[Any],
+    last_key: Any,
+    chunk_size: int,
+) -> tuple[Any, int]:
+    """Writes the chunk after the last key and returns its last key"""
+    session = await db_session(connect)
+    criteria = [] if last_key is None else [key > last_key]
+    bounds = select(key).where(*criteria).order_by(key)
+    if statement.whereclause is not None:
+        bounds = bounds.where(statement.whereclause)
+    chunk_last_key = await session.scalar(
+        bounds.offset(chunk_size - 1).limit(1)
+    )
+    if chunk_last_key is not None:
+        criteria.append(key <= chunk_last_key)
+    result = await session.execute(
+        statement.where(*criteria).execution_options(synchronize_session=False)
+    )
+    return chunk_last_key, cast("CursorResult[Any]", result).rowcount
+
+
+def _table(table: type | FromClause) -> Table:
+    if isinstance(table, FromClause):
+        local_table = table
+    else:
+        local_table = class_mapper(table).local_table
+    if not isinstance(local_table, Table):
+        raise TypeError(f"{table} is not a table")
+    return local_table
+
+
+async def _chunks(
+    rows: Iterable[Item] | AsyncIterable[Item], chunk_size: int
+) -> AsyncIterator[list[Item]]:
+    chunk: list[Item] = []
+    if isinstance(rows, AsyncIterable):
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    else:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,516 @@
+"""Caching of the results of read queries"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable, Mapping
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import FrozenResult, Result
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapper, ORMExecuteState, Session
+from sqlalchemy.orm.loading import merge_frozen_result
+from sqlalchemy.sql import ClauseElement, TableClause, visitors
+from sqlalchemy.util import await_only
+
+from .writes import (
+    ANY_TABLE,
+    is_read_only_session,
+    listen_writes,
+    track_writes,
+    written_tables,
+)
+
+_MEMO_KEY = "context_async_sqlalchemy.memo"
+_RESULT_CACHE_KEY = "context_async_sqlalchemy.result_cache"
+_IDENTITY_CACHE_KEY = "context_async_sqlalchemy.identity_cache"
+_COALESCER_KEY = "context_async_sqlalchemy.read_coalescer"
+
+# The execution option that enables the result cache for a statement:
+# True or the time to live in seconds
+CACHE_RESULT = "cache_result"
+
+# Execution options with which the result can't be reused
+_UNCACHEABLE_OPTIONS = ("populate_existing", "stream_results", "yield_per")
+
+
+class _Entry:
+    """A cached result with the tables it was read from"""
+
+    def __init__(
+        self,
+        result: FrozenResult[Any],
+        tables: set[str],
+        expires_at: float | None = None,
+    ) -> None:
+        self.result = result
+        self.tables = tables
+        self.expires_at = expires_at
+
+    def reads(self, tables: set[str]) -> bool:
+        return _overlap(self.tables, tables)
+
+
+class _Memo:
+    """Results of the read queries of a session by their keys"""
+
+    def __init__(self) -> None:
+        self.entries: dict[Hashable, _Entry] = {}
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        tables = set(tables)
+        if tables:
+            self.entries = {
+                key: entry
+                for key, entry in self.entries.items()
+                if not entry.reads(tables)
+            }
+
+
+class ResultCache:
+    """
+    A process-wide cache of the results of read queries, shared by the
+        sessions of a connection. See result_cache of DBConnect.
+
+    max_size: The maximum number of cached results, the least recently
+        used ones are evicted first.
+
+    ttl: The default time to live of a cached result in seconds.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        # Owns the copies of the cached ORM objects, it is never bound
+        self._objects = Session()
+        self._invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> FrozenResult[Any] | None:
+        """Returns the cached result or None if it's missing or expired"""
+        entry = self._entries.get(key)
+        expires_at = None if entry is None else entry.expires_at
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry.result
+
+    def put(
+        self,
+        key: Hashable,
+        result: FrozenResult[Any],
+        tables: set[str],
+        ttl: float | None = None,
+    ) -> None:
+        """Caches the result read from the tables"""
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = _Entry(result, tables, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        """
+        Drops the results read from the tables.
+        ANY_TABLE drops everything.
+        """
+        tables = set(tables)
+        if not tables:
+            return
+        self._invalidations += 1
+        for key, entry in list(self._entries.items()):
+            if entry.reads(tables):
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drops all cached results"""
+        self.invalidate({ANY_TABLE})
+
+
+class IdentityCache(ResultCache):
+    """
+    A process-wide cache of the objects loaded by session.get, by model and
+        primary key. See identity_cache of DBConnect.
+
+    ttls: The models to cache with the time to live of their objects in
+        seconds. Use it for reference data that rarely changes.
+
+    max_size: The maximum number of cached objects, the least recently
+        used ones are evicted first.
+    """
+
+    def __init__(
+        self, ttls: Mapping[type[Any], float], max_size: int = 1024
+    ) -> None:
+        super().__init__(max_size)
+        self.ttls = dict(ttls)
+
+
+class _Flight:
+    """A read query in progress that other sessions wait for"""
+
+    def __init__(self) -> None:
+        self.result: asyncio.Future[FrozenResult[Any] | None] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.waiters = 0
+
+
+class ReadCoalescer:
+    """
+    Identical read queries executed concurrently by the sessions of a
+        connection. See coalesce_reads of DBConnect.
+    """
+
+    def __init__(self) -> None:
+        self.flights: dict[Hashable, _Flight] = {}
+        # The number of queries that used the result of another session
+        self.coalesced = 0
+        # Owns the copies of the shared ORM objects, it is never bound
+        self._objects = Session()
+
+
+def memoize_queries(session: AsyncSession) -> None:
+    """
+    Starts memoizing the results of read queries executed through the
+        session, so that a query repeated with the same parameters
+        doesn't go to the database.
+    The results read from a table are forgotten as soon as the session
+        writes to it (a flush or a DML statement, also with
+        session.connection()), and all of them are forgotten at the end
+        of the transaction. Writes of the session are tracked for it (see
+        track_writes).
+    SELECT ... FOR UPDATE is never memoized, it must take the row locks.
+    """
+    session.info[_MEMO_KEY] = _Memo()
+    # The writes are seen on the connection, including the ones executed
+    # with session.connection()
+    track_writes(session)
+    listen_writes(session, forget_memoized)
+    sync_session = session.sync_session
+    if event.contains(sync_session, "do_orm_execute", _on_execute):
+        return
+    # Before the listener of autocommit sessions, so that a memoized
+    # result doesn't take a connection
+    event.listen(sync_session, "do_orm_execute", _on_execute, insert=True)
+    event.listen(sync_session, "after_commit", _forget_memo)
+    event.listen(sync_session, "after_rollback", _forget_memo)
+
+
+def cache_results(session: AsyncSession, cache: ResultCache) -> None:
+    """
+    Makes the session read through the cache the statements executed with
+        the CACHE_RESULT execution option.
+    The results read from the tables written in the current transaction
+        are neither taken from the cache nor put into it. The tables
+        written by a committed transaction are invalidated in the cache.
+    Writes of the session must be tracked (see track_writes).
+    """
+    session.info[_RESULT_CACHE_KEY] = cache
+    sync_session = session.sync_session
+    if event.contains(sync_session, "do_orm_execute", _read_through):
+        return
+    event.listen(sync_session, "do_orm_execute", _read_through, insert=True)
+    if not event.contains(sync_session, "after_commit", _on_commit):
+        event.listen(sync_session, "after_commit", _on_commit)
+
+
+def cache_identities(session: AsyncSession, cache: IdentityCache) -> None:
+    """
+    Makes session.get of the session look up the objects of the models of
+        the cache in it before going to the database.
+    It follows the rules of cache_results.
+    """
+    session.info[_IDENTITY_CACHE_KEY] = cache
+    sync_session = session.sync_session
+    if event.contains(sync_session, "do_orm_execute", _get_through):
+        return
+    event.listen(sync_session, "do_orm_execute", _get_through, insert=True)
+    if not event.contains(sync_session, "after_commit", _on_commit):
+        event.listen(sync_session, "after_commit", _on_commit)
+
+
+def coalesce_reads(session: AsyncSession, coalescer: ReadCoalescer) -> None:
+    """
+    Makes a read query of the session wait for an identical query that is
+        already running in another session and use its result instead of
+        going to the database.
+    Queries to the tables written in the current transaction are executed
+        as usual. Writes of the session must be tracked (see track_writes).
+    """
+    session.info[_COALESCER_KEY] = coalescer
+    sync_session = session.sync_session
+    if event.contains(sync_session, "do_orm_execute", _coalesce):
+        return
+    event.listen(sync_session, "do_orm_execute", _coalesce, insert=True)
+
+
+def forget_memoized(session: AsyncSession | Session, tables: set[str]) -> None:
+    """
+    Forgets the memoized results read from the tables written through the
+        session bypassing the ORM.
+    """
+    memo: _Memo | None = session.info.get(_MEMO_KEY)
+    if memo is not None:
+        memo.invalidate(tables)
+
+
+def query_cache_key(orm_execute_state: ORMExecuteState) -> Hashable | None:
+    """
+    The key of a read query: the statement with its bound parameters.
+    None means that the result of the query can't be cached.
+    """
+    if (
+        not orm_execute_state.is_select
+        or orm_execute_state.is_column_load
+        or orm_execute_state.is_relationship_load
+    ):
+        return None
+    options = orm_execute_state.execution_options
+    if any(options.get(option) for option in _UNCACHEABLE_OPTIONS):
+        return None
+    statement = orm_execute_state.statement
+    if not isinstance(statement, ClauseElement) or _locks_rows(statement):
+        return None
+    cache_key = statement._generate_cache_key()
+    if cache_key is None:
+        return None
+    key = (
+        cache_key.key,
+        tuple(
+            _hashable(bind.effective_value) for bind in cache_key.bindparams
+        ),
+        _hashable(orm_execute_state.parameters),
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def read_tables(orm_execute_state: ORMExecuteState) -> set[str]:
+    """Names of the tables the executed statement reads from"""
+    statement = orm_execute_state.statement
+    if not isinstance(statement, ClauseElement):
+        return {ANY_TABLE}
+    return {
+        element.name
+        for element in visitors.iterate(statement)
+        if isinstance(element, TableClause)
+    }
+
+
+def flush_pending_changes(session: Session) -> None:
+    """
+    Autoflush happens after the do_orm_execute listeners, so the pending
+        changes are flushed before looking up a cached result.
+    """
+    if session.autoflush and (session.new or session.dirty or session.deleted):
+        session.flush()
+
+
+def _locks_rows(statement: Any) -> bool:
+    """Whether the statement is SELECT ... FOR UPDATE (or FOR SHARE)"""
+    return getattr(statement, "_for_update_arg", None) is not None
+
+
+def _overlap(tables: set[str], other: set[str]) -> bool:
+    return bool(ANY_TABLE in tables or ANY_TABLE in other or tables & other)
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _on_execute(orm_execute_state: ORMExecuteState) -> Result[Any] | None:
+    memo: _Memo | None = orm_execute_state.session.info.get(_MEMO_KEY)
+    if memo is None:
+        return None
+    key = query_cache_key(orm_execute_state)
+    if key is None:
+        return None
+    flush_pending_changes(orm_execute_state.session)
+    entry = memo.entries.get(key)
+    if entry is None:
+        frozen = orm_execute_state.invoke_statement().freeze()
+        entry = _Entry(frozen, read_tables(orm_execute_state))
+        memo.entries[key] = entry
+    return entry.result()
+
+
+def _read_through(orm_execute_state: ORMExecuteState) -> Result[Any] | None:
+    session = orm_execute_state.session
+    cache: ResultCache | None = session.info.get(_RESULT_CACHE_KEY)
+    ttl = orm_execute_state.execution_options.get(CACHE_RESULT)
+    if cache is None or not ttl:
+        return None
+    key = query_cache_key(orm_execute_state)
+    if key is None:
+        return None
+    return _execute_cached(
+        orm_execute_state, cache, key, None if ttl is True else ttl
+    )
+
+
+def _get_through(orm_execute_state: ORMExecuteState) -> Result[Any] | None:
+    session = orm_execute_state.session
+    cache: IdentityCache | None = session.info.get(_IDENTITY_CACHE_KEY)
+    mapper = orm_execute_state.bind_mapper
+    if cache is None or mapper is None or mapper.class_ not in cache.ttls:
+        return None
+    options = orm_execute_state.execution_options
+    if any(options.get(option) for option in _UNCACHEABLE_OPTIONS):
+        return None
+    identity = _get_identity(orm_execute_state, mapper)
+    if identity is None:
+        return None
+    return _execute_cached(
+        orm_execute_state,
+        cache,
+        (mapper.class_, identity),
+        cache.ttls[mapper.class_],
+    )
+
+
+def _get_identity(
+    orm_execute_state: ORMExecuteState, mapper: Mapper[Any]
+) -> tuple[Any, ...] | None:
+    """The primary key if the statement is the one of session.get"""
+    statement = orm_execute_state.statement
+    parameters = orm_execute_state.parameters
+    # The same clause and parameters are used by session.get
+    clause, params = mapper._get_clause
+    if (
+        not orm_execute_state.is_select
+        or not isinstance(parameters, dict)
+        or parameters.keys() != {param.key for param in params.values()}
+        or _locks_rows(statement)
+    ):
+        return None
+    criteria: tuple[Any, ...] = getattr(statement, "_where_criteria", ())
+    if len(criteria) != 1 or not criteria[0].compare(clause):
+        return None
+    return tuple(
+        parameters[params[column].key] for column in mapper.primary_key
+    )
+
+
+def _execute_cached(
+    orm_execute_state: ORMExecuteState,
+    cache: ResultCache,
+    key: Hashable,
+    ttl: float | None,
+) -> Result[Any] | None:
+    tables = read_tables(orm_execute_state)
+    if not _can_share(orm_execute_state, tables):
+        return None
+
+    session = orm_execute_state.session
+    statement = orm_execute_state.statement
+    frozen = cache.get(key)
+    if frozen is None:
+        invalidations = cache._invalidations
+        result = orm_execute_state.invoke_statement().freeze()
+        # The cache gets its own copies of the ORM objects
+        frozen = _merge(cache._objects, statement, result)().freeze()
+        if invalidations == cache._invalidations:
+            # Otherwise the tables could be written while reading
+            cache.put(key, frozen, tables, ttl)
+    return _merge(session, statement, frozen)()
+
+
+def _coalesce(orm_execute_state: ORMExecuteState) -> Result[Any] | None:
+    session = orm_execute_state.session
+    coalescer: ReadCoalescer | None = session.info.get(_COALESCER_KEY)
+    if coalescer is None:
+        return None
+    key = query_cache_key(orm_execute_state)
+    if key is None or not _can_share(
+        orm_execute_state, read_tables(orm_execute_state)
+    ):
+        return None
+
+    statement = orm_execute_state.statement
+    flight = coalescer.flights.get(key)
+    if flight is not None:
+        flight.waiters += 1
+        # A cancelled waiter must not cancel the others
+        frozen = await_only(asyncio.shield(flight.result))
+        if frozen is None:
+            # The query failed in the other session, it's repeated here
+            return None
+        coalescer.coalesced += 1
+        return _merge(session, statement, frozen)()
+
+    flight = _Flight()
+    coalescer.flights[key] = flight
+    shared = None
+    try:
+        result = orm_execute_state.invoke_statement()
+        if not flight.waiters:
+            return result
+        own = result.freeze()
+        # The waiters get their own copies of the ORM objects
+        shared = _merge(coalescer._objects, statement, own)().freeze()
+        return own()
+    finally:
+        del coalescer.flights[key]
+        flight.result.set_result(shared)
+
+
+def _can_share(orm_execute_state: ORMExecuteState, tables: set[str]) -> bool:
+    """
+    Checks whether a result read by another session can be used by the
+        session of the executed statement
+    """
+    session = orm_execute_state.session
+    flush_pending_changes(session)
+    if session.new or session.dirty or session.deleted:
+        # Merging a result would overwrite the pending changes
+        return False
+    # Other sessions don't see the uncommitted changes of the session
+    written = written_tables(session)
+    return not (written and _overlap(tables, written))
+
+
+def _merge(
+    session: Session, statement: Any, result: FrozenResult[Any]
+) -> FrozenResult[Any]:
+    """Copies the ORM objects of the result into the session"""
+    merged: FrozenResult[Any] = merge_frozen_result(  # type: ignore[no-untyped-call]
+        session, statement, result, load=False
+    )
+    return merged
+
+
+def _on_commit(session: Session) -> None:
+    if is_read_only_session(session):
+        # Its "writes" can only be textual reads
+        return
+    for cache_key in (_RESULT_CACHE_KEY, _IDENTITY_CACHE_KEY):
+        cache: ResultCache | None = session.info.get(cache_key)
+        if cache is not None:
+            cache.invalidate(written_tables(session))
+
+
+def _forget_memo(session: Session) -> None:
+    # Other transactions could change anything in between
+    memo: _Memo | None = session.info.get(_MEMO_KEY)
+    if memo is not None:
+        memo.entries.clear()
@@ -1,7 +1,8 @@
 import asyncio
 from collections.abc import Callable, Coroutine
-from typing import Any
+from typing import Any, Literal
 from uuid import uuid4
+from weakref import WeakSet
 
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
@@ -9,6 +10,17 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
 )
 
+from .caching import (
+    IdentityCache,
+    ReadCoalescer,
+    ResultCache,
+    cache_identities,
+    cache_results,
+    coalesce_reads,
+)
+from .notify import InvalidationListener, publish_invalidations
+from .writes import track_writes
+
 EngineCreatorFunc = Callable[[str], AsyncEngine]
 SessionMakerCreatorFunc = Callable[
     [AsyncEngine], async_sessionmaker[AsyncSession]
@@ -25,6 +37,22 @@ class DBConnect:
         session_maker_creator: SessionMakerCreatorFunc,
         host: str | None = None,
         before_create_session_handler: AsyncFunc | None = None,
+        session_per_task: bool = False,
+        session_pool_size: int = 0,
+        commit_order: int = 0,
+        read_only: bool = False,
+        autocommit_read: bool = False,
+        skip_commit_without_writes: bool = False,
+        finalization_timeout: float | None = None,
+        idle_in_transaction_warning: float | None = None,
+        idle_in_transaction_timeout: float | None = None,
+        late_sessions: Literal["close", "raise"] = "close",
+        memoize_queries: bool = False,
+        result_cache: ResultCache | None = None,
+        invalidation_channel: str | None = None,
+        coalesce_reads: bool = False,
+        batch_lazy_loads: bool = False,
+        identity_cache: IdentityCache | None = None,
     ) -> None:
         """
         engine_creator: Specify a function that will return the
@@ -40,6 +68,102 @@ class DBConnect:
             You can, for example, check whether the host is alive and that
             it's the master and call change_host to change the host if
             necessary.
+
+        session_per_task: If enabled, db_session() called from an asyncio
+            task other than the one that owns the context session returns
+            a separate session (with its own connection) for that task.
+            These sessions are stored in the same context and are committed,
+            rolled back and closed together with the rest of the sessions.
+            It allows you to run ordinary functions that use db_session()
+            concurrently, for example with asyncio.gather.
+
+        session_pool_size: The maximum number of closed context sessions
+            kept for reuse by the following requests instead of creating
+            new AsyncSession objects. 0 disables the pool.
+            Don't keep references to context sessions after the end of
+            the request if you enable it.
+
+        commit_order: Context sessions are committed, rolled back and
+            closed in ascending order of commit_order of their connections.
+            Sessions with the same commit_order can be finalized
+            concurrently.
+
+        read_only: Context sessions of this connection run read-only
+            transactions and are not committed explicitly. For example,
+            for a connection to a replica.
+
+        autocommit_read: Context sessions of this connection execute every
+            statement outside of a transaction, and the connection is
+            returned to the pool right after the statement. Writes are
+            not allowed in such sessions.
+
+        skip_commit_without_writes: Context sessions of this connection are
+            not committed (and before_commit is not called for them) if
+            nothing was written in their transactions. The transaction ends
+            when the session is closed. Note that only ORM and Core
+            SELECT constructs are known to be reads, so don't enable it if
+            you call functions with side effects in SELECT constructs.
+
+        finalization_timeout: The maximum time in seconds that the
+            finalization of a context (commit or rollback and close of its
+            sessions) waits for the database. After that, the connections
+            are invalidated. The largest timeout of the connections used
+            in the context applies. None means no limit.
+
+        idle_in_transaction_warning: If a context session has an open
+            transaction and executes no statements for this number of
+            seconds, a warning with the route name is logged.
+
+        idle_in_transaction_timeout: After this number of idle seconds, the
+            transaction is rolled back, its connection is returned to the
+            pool, and the session can't be used anymore
+            (IdleInTransactionError).
+
+        late_sessions: What to do if a context session is requested after
+            the context was finalized, for example, by a background task
+            created in a handler. Such sessions are reported with the call
+            site (see late_sessions_count).
+            "close" - the session is closed when the task that requested
+                it is done. Commit it explicitly if needed.
+            "raise" - ContextFinalizedError is raised.
+
+        memoize_queries: Context sessions of this connection remember the
+            results of SELECT queries until the end of the request, so a
+            query repeated with the same parameters doesn't go to the
+            database. The results read from a table are forgotten when the
+            session writes to it, and all of them on rollback. Changes
+            committed by others during the request are not seen by
+            repeated queries.
+
+        result_cache: The cache of the results of the statements executed
+            with the CACHE_RESULT execution option through the sessions of
+            this connection. The results are shared between requests until
+            their TTL expires or a commit of a session of this connection
+            writes to the tables they were read from.
+
+        invalidation_channel: The name of the PostgreSQL channel that
+            announces the tables written by every commit of the sessions
+            of this connection (NOTIFY within the committing transaction).
+            A dedicated connection listens to it (see invalidation_listener)
+            and invalidates result_cache, so writes made by other
+            processes are noticed too.
+
+        coalesce_reads: A SELECT query executed by a session of this
+            connection while an identical query (same statement and
+            parameters) is running in another session waits for it and
+            gets a copy of its result instead of going to the database.
+            Queries to the tables written in the current transaction of
+            the session are not coalesced.
+
+        batch_lazy_loads: When a relationship of an object of a context
+            session is lazy loaded, it is loaded with one query for all
+            objects of the session that haven't loaded it yet. The call
+            sites are logged and counted (see batched_lazy_loads), so that
+            eager loading can be added there.
+
+        identity_cache: The cache of the objects of reference models that
+            session.get of the sessions of this connection looks up before
+            going to the database. It is invalidated like result_cache.
         """
         self.context_key = str(uuid4())
 
@@ -47,10 +171,34 @@ class DBConnect:
         self._engine_creator = engine_creator
         self._session_maker_creator = session_maker_creator
         self._before_create_session_handler = before_create_session_handler
+        self.session_per_task = session_per_task
+        self.session_pool_size = session_pool_size
+        self.commit_order = commit_order
+        self.read_only = read_only
+        self.autocommit_read = autocommit_read
+        self.skip_commit_without_writes = skip_commit_without_writes
+        self.finalization_timeout = finalization_timeout
+        self.idle_in_transaction_warning = idle_in_transaction_warning
+        self.idle_in_transaction_timeout = idle_in_transaction_timeout
+        self.late_sessions = late_sessions
+        self.memoize_queries = memoize_queries
+        self.result_cache = result_cache
+        self.read_coalescer = ReadCoalescer() if coalesce_reads else None
+        self.batch_lazy_loads = batch_lazy_loads
+        self.identity_cache = identity_cache
+        self.invalidation_listener: InvalidationListener | None = None
+        if invalidation_channel is not None:
+            self.invalidation_listener = InvalidationListener(
+                invalidation_channel, result_cache
+            )
+            if identity_cache is not None:
+                self.invalidation_listener.subscribe(identity_cache.invalidate)
 
         self._engine: AsyncEngine | None = None
         self._session_maker: async_sessionmaker[AsyncSession] | None = None
         self._lock = asyncio.Lock()
+        self._free_sessions: list[AsyncSession] = []
+        self._poolable_sessions: WeakSet[AsyncSession] = WeakSet()
 
     async def connect(self, host: str) -> None:
         """initiates engine and session maker"""
@@ -67,10 +215,71 @@ class DBConnect:
             if host != self.host:
                 await self._connect(host)
 
-    async def create_session(self) -> AsyncSession:
-        """Creates a new session"""
+    async def create_session(
+        self,
+        execution_options: dict[str, Any] | None = None,
+        **session_kw: Any,
+    ) -> AsyncSession:
+        """
+        Creates a new session or takes a free one from the pool.
+
+        execution_options: If specified, the session is bound to the engine
+            with these options applied.
+
+        session_kw: Overrides the arguments of the session maker.
+
+        Sessions with execution_options or session_kw are never pooled.
+
+        With skip_commit_without_writes, result_cache, identity_cache,
+            invalidation_channel or coalesce_reads, writes made through the
+            session are tracked (see session_has_writes).
+        """
         maker = await self.session_maker()
-        return maker()
+        if execution_options and self._engine is not None:
+            engine = self._engine.execution_options(**execution_options)
+            session_kw["bind"] = engine
+        if session_kw:
+            session = maker(**session_kw)
+        elif self._free_sessions:
+            session = self._free_sessions.pop()
+        else:
+            session = maker()
+            if self.session_pool_size:
+                self._poolable_sessions.add(session)
+        if (
+            self.skip_commit_without_writes
+            or self.result_cache is not None
+            or self.identity_cache is not None
+            or self.invalidation_listener is not None
+            or self.read_coalescer is not None
+        ):
+            track_writes(session)
+        if self.read_coalescer is not None:
+            coalesce_reads(session, self.read_coalescer)
+        # The caches are looked up before the query is coalesced
+        if self.result_cache is not None:
+            cache_results(session, self.result_cache)
+        if self.identity_cache is not None:
+            cache_identities(session, self.identity_cache)
+        if self.invalidation_listener is not None:
+            publish_invalidations(session, self.invalidation_listener)
+        return session
+
+    def release_session(self, session: AsyncSession) -> None:
+        """
+        Returns a closed session to the pool so that it can be reused.
+        Sessions that are not clean, were not created by create_session,
+            or belong to an outdated engine are simply dropped.
+        """
+        if len(self._free_sessions) >= self.session_pool_size:
+            return
+        if session not in self._poolable_sessions:
+            return
+        if not _is_clean_session(session) or session.bind is not self._engine:
+            self._poolable_sessions.discard(session)
+            return
+        session.info.clear()
+        self._free_sessions.append(session)
 
     async def session_maker(self) -> async_sessionmaker[AsyncSession]:
         """Gets the session maker"""
@@ -88,13 +297,29 @@ class DBConnect:
         return self._session_maker
 
     async def close(self) -> None:
+        if self.invalidation_listener is not None:
+            await self.invalidation_listener.stop()
         if self._engine:
             await self._engine.dispose()
         self._engine = None
         self._session_maker = None
+        self._free_sessions.clear()
+        self._poolable_sessions = WeakSet()
 
     async def _connect(self, host: str) -> None:
         self.host = host
         await self.close()
         self._engine = self._engine_creator(host)
         self._session_maker = self._session_maker_creator(self._engine)
+        if self.invalidation_listener is not None:
+            self.invalidation_listener.start(self._engine)
+
+
+def _is_clean_session(session: AsyncSession) -> bool:
+    return not (
+        session.in_transaction()
+        or session.identity_map
+        or session.new
+        or session.dirty
+        or session.deleted
+    )
@@ -1,9 +1,17 @@
-from collections.abc import Generator
+import asyncio
+import itertools
+import time
+from collections.abc import Awaitable, Callable, Generator, MutableMapping
 from contextvars import ContextVar, Token
+from typing import Any, cast
+from weakref import WeakKeyDictionary
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .connect import DBConnect
+from .finalization import finalize_groups
+from .leaks import count_leaked_session, invalidate_connections
+from .read_only import AUTOCOMMIT, read_only_execution_options
 
 
 class ContextAlreadyInitiatedError(Exception):
@@ -14,6 +22,33 @@ class ContextNotInitiatedError(Exception):
     """Context is not initiated"""
 
 
+class _SessionContainer(dict[str, AsyncSession]):
+    """
+    A mutable container of context sessions shared by the whole request.
+
+    Besides the sessions themselves, it remembers the connection each
+        session belongs to and which asyncio task owns the main session of
+        each connection, so that sessions of other tasks can be told apart.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.connects: dict[str, DBConnect] = {}
+        self.owners: dict[str, asyncio.Task[object] | None] = {}
+        # Numbers of the tasks in the keys of their own sessions. id() of a
+        # finished task is reused, so a new task would get its session
+        self.task_numbers: WeakKeyDictionary[asyncio.Task[object], int] = (
+            WeakKeyDictionary()
+        )
+        self.read_only_options: dict[str, Any] | None = None
+        self.deadline: float | None = None
+        self.scope: MutableMapping[str, Any] | None = None
+        # Loaders by connection and model, see context_loader
+        self.loaders: dict[tuple[str, type[Any]], Any] = {}
+        # Sessions created after finalization are closed by their tasks
+        self.finalized = False
+
+
 def init_db_session_ctx(
     force: bool = False,
 ) -> Token[dict[str, AsyncSession] | None]:
@@ -41,29 +76,80 @@ def pop_db_session_from_context(connect: DBConnect) -> AsyncSession | None:
     if not session_ctx:
         return None
 
-    session: AsyncSession | None = session_ctx.pop(connect.context_key, None)
+    container = cast("_SessionContainer", session_ctx)
+    key = _session_key(container, connect)
+    session: AsyncSession | None = container.pop(key, None)
+    container.connects.pop(key, None)
+    container.owners.pop(key, None)
     return session
 
 
 async def reset_db_session_ctx(
-    token: Token[dict[str, AsyncSession] | None], with_close: bool = True
+    token: Token[dict[str, AsyncSession] | None],
+    with_close: bool = True,
+    concurrently: bool = False,
 ) -> None:
     """
     Removes sessions from the context and also closes the session if it
-        is open.
+        is open. Closed sessions are returned to the session pool of their
+        connection.
+
+    concurrently: close sessions of different connections at the same time
     """
+    _finish_context()
     if with_close:
-        for session in sessions_stream():
-            await session.close()
+        await finalize_groups(session_groups(), _close, concurrently)
     _db_session_ctx.reset(token)
 
 
+async def finalize_db_session_ctx(
+    token: Token[dict[str, AsyncSession] | None],
+    finalize: Callable[[], Awaitable[None]] | None = None,
+    concurrently: bool = False,
+) -> None:
+    """
+    Runs finalize (for example, commit_all_sessions), then closes the
+        sessions and resets the context like reset_db_session_ctx.
+
+    Cancellation doesn't interrupt it: finalization completes first, and
+        then CancelledError is raised.
+    It waits for the database at most the largest finalization_timeout of
+        the connections used. After that, the connections of the sessions
+        are invalidated and TimeoutError is raised.
+    Sessions that still hold a connection afterwards (for example, the
+        following sessions after a failed commit) are counted as leaked
+        (see leaked_sessions_count), and their connections are invalidated.
+    """
+    _finish_context()
+    items = [item for group in session_groups() for item in group]
+
+    async def run() -> None:
+        try:
+            if finalize is not None:
+                await finalize()
+        finally:
+            await finalize_groups(
+                session_groups(), _close_session, concurrently
+            )
+
+    try:
+        await _wait_shielded(asyncio.ensure_future(run()), _timeout(items))
+    finally:
+        leaked = await _invalidate_leaked(items)
+        # Only after the sweep, so that it can't catch a session that
+        # another request has already taken from the pool
+        for connect, session in items:
+            if session not in leaked:
+                connect.release_session(session)
+        _db_session_ctx.reset(token)
+
+
 def get_db_session_from_context(connect: DBConnect) -> AsyncSession | None:
     """
     Extracts the session from the context
     """
     session_ctx = _get_initiated_context()
-    return session_ctx.get(connect.context_key)
+    return session_ctx.get(_session_key(session_ctx, connect))
 
 
 def put_db_session_to_context(
@@ -74,7 +160,102 @@ def put_db_session_to_context(
     Puts the session into context
     """
     session_ctx = _get_initiated_context()
-    session_ctx[connection.context_key] = session
+    key = _session_key(session_ctx, connection)
+    session_ctx[key] = session
+    session_ctx.connects[key] = connection
+    if key == connection.context_key:
+        session_ctx.owners.setdefault(key, _current_task())
+    if session_ctx.finalized:
+        _close_when_task_done(session_ctx, key)
+
+
+def is_context_finalized() -> bool:
+    """
+    Checks whether the sessions of the context were already finalized,
+        so new sessions won't be finalized along with them
+    """
+    return _get_initiated_context().finalized
+
+
+def set_read_only_ctx(
+    deferrable: bool = False,
+    isolation_level: str | None = None,
+) -> None:
+    """
+    Context sessions created after the call run read-only transactions and
+        are not committed explicitly.
+
+    Call it at the beginning of a handler (or in a dependency) that only
+        reads data.
+    """
+    _get_initiated_context().read_only_options = read_only_execution_options(
+        deferrable, isolation_level
+    )
+
+
+def set_autocommit_read_ctx() -> None:
+    """
+    Context sessions created after the call execute every statement outside
+        of a transaction, and the connection is returned to the pool right
+        after the statement. Only SELECT is allowed in such sessions
+        (see READ_STATEMENT).
+
+    Call it at the beginning of a handler (or in a dependency) that only
+        reads data and spends most of its time on something else.
+    """
+    set_read_only_ctx(isolation_level=AUTOCOMMIT)
+
+
+def get_read_only_ctx() -> dict[str, Any] | None:
+    """
+    Execution options of read-only transactions set by set_read_only_ctx
+    """
+    return _get_initiated_context().read_only_options
+
+
+def set_deadline_ctx(timeout: float) -> None:
+    """
+    Sets the time budget of the request in seconds. Transactions of context
+        sessions created after the call get statement_timeout and
+        lock_timeout equal to the time left, and their statements raise
+        DeadlineExceededError once the budget is exhausted.
+
+    An earlier deadline that is already set is kept.
+    """
+    session_ctx = _get_initiated_context()
+    deadline = time.monotonic() + timeout
+    if session_ctx.deadline is None or deadline < session_ctx.deadline:
+        session_ctx.deadline = deadline
+
+
+def get_deadline_ctx() -> float | None:
+    """
+    The deadline of the request set by set_deadline_ctx, in terms of
+        time.monotonic()
+    """
+    return _get_initiated_context().deadline
+
+
+def set_request_scope_ctx(scope: MutableMapping[str, Any]) -> None:
+    """Remembers the ASGI scope of the request, used to name the route"""
+    _get_initiated_context().scope = scope
+
+
+def get_route_name_ctx() -> str | None:
+    """
+    The method and the route path of the request, if the router has already
+        matched the route, or the request path otherwise
+    """
+    scope = _get_initiated_context().scope
+    if scope is None:
+        return None
+    path = getattr(scope.get("route"), "path", None) or scope.get("path")
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+def get_loaders_ctx() -> dict[tuple[str, type[Any]], Any]:
+    """Loaders of the context by connection and model"""
+    return _get_initiated_context().loaders
 
 
 def sessions_stream() -> Generator[AsyncSession, None, None]:
@@ -82,18 +263,165 @@ def sessions_stream() -> Generator[AsyncSession, None, None]:
     yield from _get_initiated_context().values()
 
 
+def session_groups() -> list[list[tuple[DBConnect, AsyncSession]]]:
+    """
+    Open context sessions with their connections grouped by commit_order.
+    The groups are sorted in the order they should be finalized.
+    """
+    session_ctx = _get_initiated_context()
+    groups: dict[int, list[tuple[DBConnect, AsyncSession]]] = {}
+    for key, session in list(session_ctx.items()):
+        connect = session_ctx.connects[key]
+        groups.setdefault(connect.commit_order, []).append((connect, session))
+    return [groups[order] for order in sorted(groups)]
+
+
+# Strong references to the tasks that close late sessions
+_background_tasks: set[asyncio.Future[None]] = set()
+
+# Numbers of tasks are never reused, unlike their ids
+_task_numbers = itertools.count(1)
+
 _db_session_ctx: ContextVar[dict[str, AsyncSession] | None] = ContextVar(
     "db_session_ctx", default=None
 )
 
 
-def _get_initiated_context() -> dict[str, AsyncSession]:
+def _get_initiated_context() -> _SessionContainer:
     session_ctx = _db_session_ctx.get()
     if session_ctx is None:
         raise ContextNotInitiatedError("Context is not initiated")
-    return session_ctx
+    return cast("_SessionContainer", session_ctx)
 
 
 def _init_db_session_ctx() -> Token[dict[str, AsyncSession] | None]:
-    session_ctx: dict[str, AsyncSession] | None = {}
+    session_ctx: dict[str, AsyncSession] | None = _SessionContainer()
     return _db_session_ctx.set(session_ctx)
+
+
+def _finish_context() -> None:
+    session_ctx = _get_initiated_context()
+    session_ctx.finalized = True
+    # The loaded objects belong to the sessions that are being closed
+    session_ctx.loaders.clear()
+
+
+def _session_key(session_ctx: _SessionContainer, connect: DBConnect) -> str:
+    """
+    The main session of a connection is stored under its context_key.
+    With session_per_task enabled, tasks other than the owner of the main
+        session get their own key, and therefore their own session.
+    """
+    key = connect.context_key
+    if session_ctx.finalized:
+        # Late sessions are closed by their tasks, so they are not shared
+        return _task_key(session_ctx, key, _current_task())
+    if not connect.session_per_task:
+        return key
+    task = _current_task()
+    owner = session_ctx.owners.get(key)
+    if key not in session_ctx or owner is None or owner is task:
+        return key
+    return _task_key(session_ctx, key, task)
+
+
+def _task_key(
+    session_ctx: _SessionContainer,
+    key: str,
+    task: asyncio.Task[object] | None,
+) -> str:
+    if task is None:
+        return f"{key}:"
+    number = session_ctx.task_numbers.get(task)
+    if number is None:
+        number = session_ctx.task_numbers[task] = next(_task_numbers)
+    return f"{key}:{number}"
+
+
+async def _close(item: tuple[DBConnect, AsyncSession]) -> None:
+    connect, session = item
+    await session.close()
+    connect.release_session(session)
+
+
+async def _close_session(item: tuple[DBConnect, AsyncSession]) -> None:
+    await item[1].close()
+
+
+def _timeout(items: list[tuple[DBConnect, AsyncSession]]) -> float | None:
+    timeouts = [
+        connect.finalization_timeout
+        for connect, _ in items
+        if connect.finalization_timeout is not None
+    ]
+    return max(timeouts, default=None)
+
+
+async def _wait_shielded(
+    task: asyncio.Future[None],
+    timeout: float | None,
+) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    cancelled = False
+    try:
+        while not task.done():
+            remaining = None if deadline is None else deadline - loop.time()
+            try:
+                await asyncio.wait_for(asyncio.shield(task), remaining)
+            except asyncio.CancelledError:
+                cancelled = True
+    except asyncio.TimeoutError:
+        # The task is stuck waiting for the database, the leaked sessions
+        # are invalidated by the caller
+        task.cancel()
+        task.add_done_callback(_ignore_result)
+        raise
+    if cancelled:
+        raise asyncio.CancelledError
+
+
+async def _invalidate_leaked(
+    items: list[tuple[DBConnect, AsyncSession]],
+) -> set[AsyncSession]:
+    """Invalidates the sessions that escaped finalization and returns them"""
+    leaked = set()
+    for _, session in items:
+        if invalidate_connections(session):
+            count_leaked_session(session, "finalization timed out")
+            leaked.add(session)
+        elif session.in_transaction() is True:
+            count_leaked_session(session, "not closed")
+            await session.invalidate()
+            leaked.add(session)
+    return leaked
+
+
+def _ignore_result(task: asyncio.Future[None]) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+def _close_when_task_done(session_ctx: _SessionContainer, key: str) -> None:
+    task = _current_task()
+    if task is None:
+        return
+
+    def close(_: object) -> None:
+        session = session_ctx.pop(key, None)
+        connect = session_ctx.connects.pop(key, None)
+        session_ctx.owners.pop(key, None)
+        if session is not None and connect is not None:
+            closing = asyncio.ensure_future(_close((connect, session)))
+            _background_tasks.add(closing)
+            closing.add_done_callback(_background_tasks.discard)
+
+    task.add_done_callback(close)
+
+
+def _current_task() -> asyncio.Task[object] | None:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        # no running event loop
+        return None
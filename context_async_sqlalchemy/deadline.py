@@ -0,0 +1,93 @@
+import math
+import time
+from typing import Any
+
+from sqlalchemy import Connection, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
+
+from .read_only import AUTOCOMMIT
+
+_DEADLINE_KEY = "context_async_sqlalchemy.deadline"
+
+# The largest statement_timeout and lock_timeout of PostgreSQL
+_MAX_TIMEOUT_MS = 2**31 - 1
+
+
+class DeadlineExceededError(Exception):
+    """The time budget of the request is exhausted"""
+
+
+def request_timeout(
+    timeout: float | None,
+    header_value: str | None,
+) -> float | None:
+    """
+    The time budget of a request in seconds: the smaller of the configured
+        timeout and the header value in milliseconds.
+    An invalid header value is ignored, as well as a value that is not
+        a finite positive number.
+    """
+    try:
+        header_timeout = float(header_value) / 1000 if header_value else None
+    except ValueError:
+        header_timeout = None
+    if (
+        header_timeout is None
+        or not math.isfinite(header_timeout)
+        or header_timeout <= 0
+    ):
+        return timeout
+    if timeout is None:
+        return header_timeout
+    return min(timeout, header_timeout)
+
+
+def apply_deadline(session: AsyncSession, deadline: float) -> None:
+    """
+    Makes the transactions of the session run with statement_timeout and
+        lock_timeout equal to the time left until the deadline
+        (time.monotonic()). Statements after the deadline raise
+        DeadlineExceededError without reaching the database.
+    """
+    session.info[_DEADLINE_KEY] = deadline
+    sync_session = session.sync_session
+    if event.contains(sync_session, "after_begin", _set_timeouts):
+        return
+    event.listen(sync_session, "after_begin", _set_timeouts)
+    # Before the listeners that execute the statement themselves
+    event.listen(sync_session, "do_orm_execute", _check_deadline, insert=True)
+
+
+def _remaining_ms(info: dict[str, Any]) -> int | None:
+    deadline: float | None = info.get(_DEADLINE_KEY)
+    if deadline is None:
+        return None
+    remaining = int((deadline - time.monotonic()) * 1000)
+    if remaining <= 0:
+        raise DeadlineExceededError("Request deadline exceeded")
+    return remaining
+
+
+def _set_timeouts(
+    session: Session,
+    transaction: SessionTransaction,
+    connection: Connection,
+) -> None:
+    remaining = _remaining_ms(session.info)
+    isolation_level = connection.get_execution_options().get("isolation_level")
+    # Outside of a transaction the settings would have no effect
+    if remaining is None or isolation_level == AUTOCOMMIT:
+        return
+    # A single round trip, the settings end with the transaction
+    timeout = f"{min(remaining, _MAX_TIMEOUT_MS)}ms"
+    connection.execute(
+        select(
+            func.set_config("statement_timeout", timeout, True),
+            func.set_config("lock_timeout", timeout, True),
+        )
+    )
+
+
+def _check_deadline(orm_execute_state: ORMExecuteState) -> None:
+    _remaining_ms(orm_execute_state.session.info)
@@ -17,11 +17,19 @@ from ..starlette_utils import (
 def add_fastapi_http_db_session_middleware(
     app: FastAPI,
     before_commit: BeforeCommitCallback | None = None,
+    concurrent_finalization: bool = False,
+    two_phase_commit: bool = False,
+    timeout: float | None = None,
+    timeout_header: str | None = None,
 ) -> None:
     """Adds middleware to the application"""
     add_starlette_http_db_session_middleware(
         app,
         before_commit=before_commit,
+        concurrent_finalization=concurrent_finalization,
+        two_phase_commit=two_phase_commit,
+        timeout=timeout,
+        timeout_header=timeout_header,
     )
 
 
@@ -29,6 +37,10 @@ async def fastapi_http_db_session_middleware(
     request: Request,
     call_next: RequestResponseEndpoint,
     before_commit: BeforeCommitCallback | None = None,
+    concurrent_finalization: bool = False,
+    two_phase_commit: bool = False,
+    timeout: float | None = None,
+    timeout_header: str | None = None,
 ) -> Response:
     """
     Database session lifecycle management.
@@ -38,9 +50,25 @@ async def fastapi_http_db_session_middleware(
         the response status is < 400. Otherwise, a rollback is performed.
 
     But you can commit or rollback manually in the handler.
+
+    concurrent_finalization: commit, roll back and close sessions
+        of different connections concurrently (see DBConnect commit_order)
+
+    two_phase_commit: commit sessions of different connections atomically
+        using two-phase commit (see commit_all_sessions)
+
+    timeout: the time budget of a request in seconds (see set_deadline_ctx)
+
+    timeout_header: the name of the header with the time budget of
+        a request in milliseconds. The smaller of the header value and
+        timeout is used.
     """
     return await starlette_http_db_session_middleware(
         request,
         call_next,
         before_commit=before_commit,
+        concurrent_finalization=concurrent_finalization,
+        two_phase_commit=two_phase_commit,
+        timeout=timeout,
+        timeout_header=timeout_header,
     )
@@ -0,0 +1,62 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from typing import TypeVar
+
+Item = TypeVar("Item")
+
+
+class SessionsFinalizationError(Exception):
+    """Several sessions failed to commit, roll back or close"""
+
+    def __init__(self, errors: Sequence[Exception]) -> None:
+        super().__init__(
+            f"{len(errors)} sessions failed to finalize: "
+            + "; ".join(repr(error) for error in errors)
+        )
+        self.errors = list(errors)
+
+
+async def finalize_groups(
+    groups: Sequence[Sequence[Item]],
+    finalize: Callable[[Item], Awaitable[None]],
+    concurrently: bool = False,
+) -> None:
+    """
+    Applies finalize to every item group by group.
+
+    Sequentially, the first error stops finalization.
+    Concurrently, the items of a group are finalized at the same time,
+        and all of them complete even if some fail. Then the error is raised
+        and the following groups are not finalized. If several items fail,
+        SessionsFinalizationError with all errors is raised.
+    """
+    for group in groups:
+        if concurrently:
+            await _finalize_concurrently(group, finalize)
+        else:
+            for item in group:
+                await finalize(item)
+
+
+async def _finalize_concurrently(
+    group: Sequence[Item],
+    finalize: Callable[[Item], Awaitable[None]],
+) -> None:
+    if len(group) == 1:
+        await finalize(group[0])
+        return
+
+    results = await asyncio.gather(
+        *(finalize(item) for item in group), return_exceptions=True
+    )
+    errors = []
+    for result in results:
+        if isinstance(result, Exception):
+            errors.append(result)
+        elif isinstance(result, BaseException):
+            raise result
+
+    if len(errors) == 1:
+        raise errors[0]
+    if errors:
+        raise SessionsFinalizationError(errors)
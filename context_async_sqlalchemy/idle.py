@@ -0,0 +1,244 @@
+"""Watchdog of context sessions that are idle in transaction"""
+
+import asyncio
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+from weakref import WeakSet
+
+from sqlalchemy import Connection, event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    ORMExecuteState,
+    Session,
+    SessionTransaction,
+    UOWTransaction,
+)
+
+logger = logging.getLogger("context_async_sqlalchemy")
+
+_WATCHDOG_KEY = "context_async_sqlalchemy.idle_watchdog"
+
+# Events of a connection that are dispatched before its transaction ends
+_END_EVENTS = ("commit", "rollback", "commit_twophase", "rollback_twophase")
+
+# Connections whose transactions are rolled back by the watchdog
+_aborted_connections: WeakSet[Connection] = WeakSet()
+
+
+class IdleInTransactionError(InvalidRequestError):
+    """The transaction was rolled back, as it was idle for too long"""
+
+
+def watch_idle_transactions(
+    session: AsyncSession,
+    warning: float | None,
+    timeout: float | None,
+    route_name: str | None = None,
+) -> None:
+    """
+    Measures the time since the last statement while the session has an
+        open transaction.
+
+    After warning seconds, a warning with the route name is logged.
+    After timeout seconds, the transaction is rolled back, so the
+        connection is returned to the pool, and any further use of the
+        session raises IdleInTransactionError. If the rollback fails, the
+        connection is invalidated instead.
+    """
+    session.info[_WATCHDOG_KEY] = _IdleWatchdog(
+        session, warning, timeout, route_name
+    )
+    sync_session = session.sync_session
+    if event.contains(sync_session, "after_begin", _on_begin):
+        return
+    event.listen(sync_session, "after_begin", _on_begin)
+    event.listen(sync_session, "after_transaction_end", _on_transaction_end)
+    event.listen(sync_session, "do_orm_execute", _check_aborted, insert=True)
+    event.listen(sync_session, "before_flush", _check_flush)
+
+
+@contextmanager
+def idle_watchdog_paused(session: AsyncSession) -> Iterator[None]:
+    """
+    Disarms the watchdog of the session while the block works with the
+        driver connection directly, out of sight of the cursor events,
+        and arms it again after the block.
+    If the block fails, the watchdog stays disarmed until the end of the
+        transaction, as after a failed statement.
+    """
+    watchdog = _watchdog(session.sync_session)
+    if watchdog is None:
+        yield
+        return
+    watchdog.check()
+    watchdog.disarm()
+    yield
+    watchdog.arm()
+
+
+class _IdleWatchdog:
+    """The timer of the current transaction of a session"""
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        warning: float | None,
+        timeout: float | None,
+        route_name: str | None,
+    ) -> None:
+        self.session = session
+        self.thresholds = sorted(
+            threshold
+            for threshold in (warning, timeout)
+            if threshold is not None
+        )
+        self.timeout = timeout
+        self.route_name = route_name or "-"
+        self.aborted = False
+        self.idle_since = 0.0
+        self.timer: asyncio.TimerHandle | None = None
+        self.rollback: asyncio.Future[None] | None = None
+        self.connection: Connection | None = None
+
+    def begin(self, connection: Connection) -> None:
+        self.connection = connection
+        if not event.contains(
+            connection, "before_cursor_execute", self.on_statement
+        ):
+            event.listen(
+                connection, "before_cursor_execute", self.on_statement
+            )
+            event.listen(connection, "after_cursor_execute", self.on_result)
+            # COMMIT and ROLLBACK are not cursor executions, and the
+            # transaction must not be rolled back while they are in flight
+            for name in _END_EVENTS:
+                event.listen(connection, name, self.on_end)
+        self.arm()
+
+    def on_statement(self, *args: Any) -> None:
+        # A failed statement leaves the timer disarmed until the end of
+        # the transaction, so there are no false alarms
+        self.disarm()
+
+    def on_result(self, *args: Any) -> None:
+        self.arm()
+
+    def on_end(self, *args: Any) -> None:
+        self.disarm()
+
+    def arm(self) -> None:
+        self.disarm()
+        if not self.thresholds:
+            return
+        loop = asyncio.get_running_loop()
+        self.idle_since = loop.time()
+        self.timer = loop.call_at(
+            self.idle_since + self.thresholds[0], self.on_idle
+        )
+
+    def disarm(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def on_idle(self) -> None:
+        loop = asyncio.get_running_loop()
+        idle = loop.time() - self.idle_since
+        if self.timeout is not None and idle >= self.timeout:
+            self.abort(idle)
+            return
+
+        logger.warning(
+            "Transaction is idle for %.1f s in %s", idle, self.route_name
+        )
+        later = [
+            threshold for threshold in self.thresholds if threshold > idle
+        ]
+        if later:
+            self.timer = loop.call_at(self.idle_since + later[0], self.on_idle)
+
+    def abort(self, idle: float) -> None:
+        logger.warning(
+            "Transaction is idle for %.1f s in %s, rolling it back",
+            idle,
+            self.route_name,
+        )
+        self.timer = None
+        self.aborted = True
+        if self.connection is not None:
+            # The connection may be busy with something the watchdog
+            # doesn't see. If the rollback fails, the transaction may be
+            # still open, so the connection must not go back to the pool
+            _aborted_connections.add(self.connection)
+            engine = self.connection.engine
+            if not event.contains(engine, "handle_error", _on_error):
+                event.listen(engine, "handle_error", _on_error)
+        self.rollback = asyncio.ensure_future(self.session.rollback())
+        self.rollback.add_done_callback(_log_rollback_error)
+
+    def check(self) -> None:
+        if self.aborted:
+            raise IdleInTransactionError(
+                "The transaction was rolled back, as it was idle for too long"
+            )
+
+
+def _watchdog(session: Session) -> _IdleWatchdog | None:
+    watchdog: _IdleWatchdog | None = session.info.get(_WATCHDOG_KEY)
+    return watchdog
+
+
+def _on_begin(
+    session: Session,
+    transaction: SessionTransaction,
+    connection: Connection,
+) -> None:
+    watchdog = _watchdog(session)
+    if watchdog is not None:
+        watchdog.begin(connection)
+
+
+def _on_transaction_end(
+    session: Session,
+    transaction: SessionTransaction,
+) -> None:
+    watchdog = _watchdog(session)
+    if watchdog is not None and transaction.parent is None:
+        watchdog.disarm()
+
+
+def _check_aborted(orm_execute_state: ORMExecuteState) -> None:
+    watchdog = _watchdog(orm_execute_state.session)
+    if watchdog is not None:
+        watchdog.check()
+
+
+def _check_flush(
+    session: Session,
+    flush_context: UOWTransaction,
+    instances: object,
+) -> None:
+    watchdog = _watchdog(session)
+    if watchdog is not None:
+        watchdog.check()
+
+
+def _on_error(context: ExceptionContext) -> None:
+    if context.connection in _aborted_connections:
+        # The connection is closed and discarded by the pool, the other
+        # connections of the pool are kept
+        context.is_disconnect = True
+        context.invalidate_pool_on_disconnect = False
+
+
+def _log_rollback_error(rollback: asyncio.Future[None]) -> None:
+    if not rollback.cancelled() and rollback.exception() is not None:
+        logger.warning(
+            "Rollback of an idle transaction failed, its connection is"
+            " invalidated",
+            exc_info=rollback.exception(),
+        )
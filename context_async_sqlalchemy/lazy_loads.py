@@ -0,0 +1,137 @@
+"""Batching of lazy loads of relationships of context session objects"""
+
+import logging
+from typing import Any
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    InstanceState,
+    ORMExecuteState,
+    RelationshipProperty,
+    Session,
+    aliased,
+)
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .leaks import call_site
+
+logger = logging.getLogger("context_async_sqlalchemy")
+
+_BATCHING_KEY = "context_async_sqlalchemy.batch_lazy_loads"
+
+# The number of parent objects loaded by one query
+_CHUNK_SIZE = 500
+
+_batched: dict[str, int] = {}
+
+
+def batch_lazy_loads(session: AsyncSession) -> None:
+    """
+    When a relationship of an object of the session is lazy loaded, it is
+        also loaded with one query for all other objects of the session
+        that have the relationship and haven't loaded it yet, so they
+        don't lazy load it one by one.
+    Each call site where it happens is logged once and counted
+        (see batched_lazy_loads).
+    """
+    session.info[_BATCHING_KEY] = True
+    sync_session = session.sync_session
+    if event.contains(sync_session, "do_orm_execute", _on_execute):
+        return
+    # Before the listener of autocommit sessions, which returns the result
+    event.listen(sync_session, "do_orm_execute", _on_execute, insert=True)
+
+
+def batched_lazy_loads() -> dict[str, int]:
+    """
+    The number of batched lazy loads by the call site and the relationship.
+    Consider eager loading of these relationships.
+    """
+    return dict(_batched)
+
+
+def _on_execute(orm_execute_state: ORMExecuteState) -> None:
+    session = orm_execute_state.session
+    parent = orm_execute_state.lazy_loaded_from
+    path = orm_execute_state.loader_strategy_path
+    if parent is None or path is None or not session.info.get(_BATCHING_KEY):
+        return
+    prop = path[-1]
+    if not isinstance(prop, RelationshipProperty):
+        return
+    if len(prop.parent.primary_key) != 1:
+        return
+    siblings = list(_siblings(session, parent, prop).items())
+    if not siblings:
+        return
+
+    for start in range(0, len(siblings), _CHUNK_SIZE):
+        _load(session, prop, dict(siblings[start : start + _CHUNK_SIZE]))
+
+    site = call_site()
+    name = f"{site} {prop}"
+    if name not in _batched:
+        logger.warning(
+            "Lazy load of %s at %s was batched for %d objects",
+            prop,
+            site,
+            len(siblings),
+        )
+    _batched[name] = _batched.get(name, 0) + 1
+
+
+def _siblings(
+    session: Session,
+    parent: InstanceState[Any],
+    prop: RelationshipProperty[Any],
+) -> dict[Any, object]:
+    """Objects by primary key that haven't loaded the relationship yet"""
+    siblings = {}
+    for state in session.identity_map.all_states():
+        obj = state.obj()
+        if (
+            state is parent
+            or obj is None
+            or state.identity is None
+            or not state.mapper.isa(prop.parent)
+            or prop.key not in state.unloaded
+        ):
+            continue
+        siblings[state.identity[0]] = obj
+    return siblings
+
+
+def _load(
+    session: Session,
+    prop: RelationshipProperty[Any],
+    objects: dict[Any, object],
+) -> None:
+    mapper = prop.parent
+    pk = mapper.get_property_by_column(mapper.primary_key[0]).class_attribute
+    relationship = getattr(mapper.class_, prop.key)
+    target: Any = prop.entity
+    order_by = prop.order_by or ()
+    if prop.mapper.isa(mapper):
+        # A self-referential relationship needs an alias
+        target = aliased(prop.entity)
+        relationship = relationship.of_type(target)
+        order_by = ()
+    statement = (
+        select(pk, target)
+        .join(relationship)
+        .where(pk.in_(objects))
+        .order_by(*order_by)
+        .execution_options(autoflush=False)
+    )
+
+    values: dict[Any, list[Any]] = {}
+    for key, value in session.execute(statement):
+        values.setdefault(key, []).append(value)
+    for key, obj in objects.items():
+        loaded = values.get(key, [])
+        set_committed_value(
+            obj,
+            prop.key,
+            loaded if prop.uselist else next(iter(loaded), None),
+        )
@@ -0,0 +1,137 @@
+"""Accounting of context sessions that escaped finalization"""
+
+import inspect
+import logging
+import os
+from pathlib import Path
+
+import sqlalchemy
+from greenlet import getcurrent  # type: ignore[import-untyped]
+from sqlalchemy import Connection, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+logger = logging.getLogger("context_async_sqlalchemy")
+
+_CONNECTIONS_KEY = "context_async_sqlalchemy.connections"
+
+# Frames of these directories are skipped when looking for the call site
+_SKIPPED_DIRS = (
+    f"{Path(__file__).parent}{os.sep}",
+    f"{Path(sqlalchemy.__file__).parent}{os.sep}",
+)
+
+_leaked_sessions = 0
+_late_sessions = 0
+
+
+class ContextFinalizedError(Exception):
+    """A session is requested from a context that is already finalized"""
+
+
+def track_connections(session: AsyncSession) -> None:
+    """
+    Remembers the connections of the current transaction of the session,
+        so that they can be invalidated without touching the session.
+    """
+    sync_session = session.sync_session
+    if event.contains(sync_session, "after_begin", _on_begin):
+        return
+    event.listen(sync_session, "after_begin", _on_begin)
+    event.listen(sync_session, "after_transaction_end", _on_transaction_end)
+
+
+def invalidate_connections(session: AsyncSession) -> bool:
+    """
+    Invalidates the connections still held by the session: they are closed
+        without waiting for the database and are not reused by the pool.
+    It doesn't go through the session, so it works even while a commit or
+        a close of the session is stuck.
+
+    Returns whether the session held any connection.
+    """
+    connections: list[Connection] = session.info.pop(_CONNECTIONS_KEY, [])
+    for connection in connections:
+        connection.invalidate()
+    return bool(connections)
+
+
+def count_leaked_session(session: AsyncSession, reason: str) -> None:
+    """Counts a session that escaped finalization and logs a warning"""
+    global _leaked_sessions
+    _leaked_sessions += 1
+    logger.warning("Session %r escaped finalization: %s", session, reason)
+
+
+def leaked_sessions_count() -> int:
+    """
+    The number of context sessions that escaped finalization so far.
+    Their connections were invalidated, so they don't exhaust the pool,
+        but a growing number means that something is wrong.
+    """
+    return _leaked_sessions
+
+
+def report_late_session(close: bool) -> None:
+    """
+    Counts and reports a context session created after the context was
+        finalized, with the call site that requested it.
+    Raises ContextFinalizedError if the session is not going to be closed
+        automatically.
+    """
+    global _late_sessions
+    _late_sessions += 1
+    message = (
+        "Context session requested after the end of the request "
+        f"at {call_site()}"
+    )
+    if not close:
+        raise ContextFinalizedError(message)
+    logger.warning("%s, it is closed when its task is done", message)
+
+
+def late_sessions_count() -> int:
+    """
+    The number of context sessions requested after their context was
+        finalized, for example, by a background task created in a handler
+    """
+    return _late_sessions
+
+
+def call_site() -> str:
+    """
+    The file and line of the first frame outside of this package and
+        SQLAlchemy that led to the current call
+    """
+    frame = inspect.currentframe()
+    current = getcurrent()
+    while True:
+        while frame is not None:
+            if not frame.f_code.co_filename.startswith(_SKIPPED_DIRS):
+                return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+            frame = frame.f_back
+        # Sync code of AsyncSession runs in a greenlet, and the code that
+        # awaits it is in the frames of the parent greenlet
+        current = current.parent
+        if current is None:
+            return "unknown"
+        frame = current.gr_frame
+
+
+def _on_begin(
+    session: Session,
+    transaction: SessionTransaction,
+    connection: Connection,
+) -> None:
+    connections = session.info.setdefault(_CONNECTIONS_KEY, [])
+    if connection not in connections:
+        connections.append(connection)
+
+
+def _on_transaction_end(
+    session: Session,
+    transaction: SessionTransaction,
+) -> None:
+    if transaction.parent is None:
+        # The connections are returned to the pool
+        session.info.pop(_CONNECTIONS_KEY, None)
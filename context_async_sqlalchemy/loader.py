@@ -0,0 +1,127 @@
+"""Batched lookups of ORM objects by primary key within a context"""
+
+import asyncio
+from collections.abc import Hashable, Iterable
+from typing import Generic, TypeVar
+
+from sqlalchemy import ARRAY, any_, bindparam, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import class_mapper
+
+from .connect import DBConnect
+from .context import get_loaders_ctx
+from .session import db_session
+
+Model = TypeVar("Model")
+
+
+class ContextLoader(Generic[Model]):
+    """
+    Loads objects of a model by primary key with the context session.
+    Keys requested in the same event loop iteration are loaded with one
+        query, and the loaded objects are remembered until the end of the
+        request.
+    """
+
+    def __init__(self, connect: DBConnect, model: type[Model]) -> None:
+        mapper = class_mapper(model)
+        if len(mapper.primary_key) != 1:
+            raise InvalidRequestError(
+                "Only models with a single-column primary key are supported"
+            )
+        column = mapper.primary_key[0]
+        self.connect = connect
+        self.model = model
+        self._key = mapper.get_property_by_column(column).key
+        self._statement = select(model).where(
+            column == any_(bindparam("keys", type_=ARRAY(column.type)))
+        )
+        self._loaded: dict[Hashable, Model | None] = {}
+        self._batch: _Batch | None = None
+        self._lock = asyncio.Lock()
+
+    async def load(self, key: Hashable) -> Model | None:
+        """Returns the object with the primary key or None if there's none"""
+        while key not in self._loaded:
+            batch = self._batch
+            if batch is None:
+                await self._run_batch(key)
+                continue
+            batch.keys.add(key)
+            # A cancelled lookup must not cancel the batch
+            await asyncio.shield(batch.done)
+            if batch.error is not None:
+                raise batch.error
+        return self._loaded[key]
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list[Model | None]:
+        """Loads the objects with one query, in the order of the keys"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self, key: Hashable | None = None) -> None:
+        """
+        Forgets the loaded object with the key, or all of them, so they
+            are loaded again. For example, after they were changed.
+        """
+        if key is None:
+            self._loaded.clear()
+        else:
+            self._loaded.pop(key, None)
+
+    async def _run_batch(self, key: Hashable) -> None:
+        batch = self._batch = _Batch({key})
+        try:
+            # The lookups of the same iteration join the batch
+            await asyncio.sleep(0)
+            async with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+                await self._fetch(batch.keys - self._loaded.keys())
+        except Exception as exc:
+            batch.error = exc
+            raise
+        finally:
+            # If the batch was cancelled, the waiting lookups start a new one
+            if self._batch is batch:
+                self._batch = None
+            batch.done.set_result(None)
+
+    async def _fetch(self, keys: set[Hashable]) -> None:
+        if not keys:
+            return
+        session = await db_session(self.connect)
+        result = await session.execute(self._statement, {"keys": list(keys)})
+        for obj in result.scalars():
+            self._loaded[getattr(obj, self._key)] = obj
+        for key in keys:
+            self._loaded.setdefault(key, None)
+
+
+class _Batch:
+    """The keys that are loaded with one query"""
+
+    def __init__(self, keys: set[Hashable]) -> None:
+        self.keys = keys
+        self.done: asyncio.Future[None] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.error: Exception | None = None
+
+
+def context_loader(
+    connect: DBConnect, model: type[Model]
+) -> ContextLoader[Model]:
+    """
+    Returns the loader of the model for the current context. The same
+        loader is returned until the context is reset.
+
+    example of use:
+        loader = context_loader(connect, User)
+        users = await asyncio.gather(*(loader.load(id_) for id_ in ids))
+    """
+    loaders = get_loaders_ctx()
+    key = (connect.context_key, model)
+    loader: ContextLoader[Model] | None = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = ContextLoader(connect, model)
+    return loader
@@ -0,0 +1,210 @@
+"""Invalidation of cached results across processes with LISTEN/NOTIFY"""
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from .caching import ResultCache
+from .writes import ANY_TABLE, is_read_only_session, written_tables
+
+logger = logging.getLogger("context_async_sqlalchemy")
+
+_LISTENER_KEY = "context_async_sqlalchemy.invalidation_listener"
+
+# The maximum length of a NOTIFY payload in PostgreSQL is 8000 bytes
+_MAX_PAYLOAD = 7999
+
+InvalidationCallback = Callable[[set[str]], None]
+
+
+class InvalidationListener:
+    """
+    Keeps a dedicated connection listening to the invalidation channel and
+        fans the received notifications out to the result cache and the
+        subscribers. See invalidation_channel of DBConnect.
+
+    The payload of a notification is a comma-separated list of the written
+        tables, ANY_TABLE means that any table could be written.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        cache: ResultCache | None = None,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        self.channel = channel
+        self.cache = cache
+        self.reconnect_delay = reconnect_delay
+        # Set while the LISTEN connection is up
+        self.listening = asyncio.Event()
+        self._subscribers: list[InvalidationCallback] = []
+        self._task: asyncio.Task[None] | None = None
+        self._connection: Any = None
+        self._lock = asyncio.Lock()
+        self._notifications: set[asyncio.Task[None]] = set()
+
+    def subscribe(self, callback: InvalidationCallback) -> None:
+        """
+        Calls the callback with the names of the tables written by every
+            transaction committed by any process.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: InvalidationCallback) -> None:
+        self._subscribers.remove(callback)
+
+    def start(self, engine: AsyncEngine) -> None:
+        """Starts listening on a connection of the engine in the background"""
+        self._task = asyncio.create_task(self._listen(engine))
+
+    async def stop(self) -> None:
+        """Stops listening and returns the connection to the pool"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def notify(self, tables: set[str]) -> None:
+        """
+        Notifies the channel from the listener connection, outside of any
+            transaction. If it's not connected, only this process is
+            notified.
+        """
+        if self._connection is None:
+            logger.warning("Invalidation of %s is not published", tables)
+            self.dispatch(tables)
+            return
+        async with self._lock:
+            await self._connection.execute(
+                "SELECT pg_notify($1, $2)", self.channel, _payload(tables)
+            )
+
+    def notify_later(self, tables: set[str]) -> None:
+        """Notifies the channel in the background"""
+        task = asyncio.ensure_future(self.notify(tables))
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+        task.add_done_callback(_log_notify_error)
+
+    def dispatch(self, tables: set[str]) -> None:
+        """Invalidates the tables in the cache and notifies the subscribers"""
+        if self.cache is not None:
+            self.cache.invalidate(tables)
+        for callback in list(self._subscribers):
+            try:
+                callback(tables)
+            except Exception:  # noqa: PERF203
+                logger.exception("Invalidation subscriber failed")
+
+    async def _listen(self, engine: AsyncEngine) -> None:
+        while True:
+            try:
+                await self._listen_once(engine)
+            except Exception:
+                logger.warning(
+                    "LISTEN connection to %r failed",
+                    self.channel,
+                    exc_info=True,
+                )
+            finally:
+                self._connection = None
+                self.listening.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen_once(self, engine: AsyncEngine) -> None:
+        async with engine.connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            driver_connection: Any = raw_connection.driver_connection
+            if not hasattr(driver_connection, "add_listener"):
+                raise TypeError("LISTEN requires the asyncpg driver")
+            lost = asyncio.Event()
+            driver_connection.add_termination_listener(
+                lambda *args: lost.set()
+            )
+            await driver_connection.add_listener(
+                self.channel, self._on_notification
+            )
+            # The notifications sent while disconnected are lost
+            self.dispatch({ANY_TABLE})
+            self._connection = driver_connection
+            self.listening.set()
+            await lost.wait()
+
+    def _on_notification(self, *args: Any) -> None:
+        payload: str = args[-1]
+        self.dispatch(set(payload.split(",")))
+
+
+def publish_invalidations(
+    session: AsyncSession, listener: InvalidationListener
+) -> None:
+    """
+    Makes every commit of the session that writes to tables notify the
+        channel of the listener about them.
+    The notification is sent within the committing transaction, so it is
+        delivered only if the transaction commits. Two-phase transactions
+        can't notify, they are announced from the listener connection
+        right after the commit.
+    Read-only sessions and textual statements marked with READ_STATEMENT
+        never notify.
+    Writes of the session must be tracked (see track_writes).
+    """
+    session.info[_LISTENER_KEY] = listener
+    sync_session = session.sync_session
+    if event.contains(sync_session, "before_commit", _on_before_commit):
+        return
+    event.listen(sync_session, "before_commit", _on_before_commit)
+    event.listen(sync_session, "after_commit", _on_after_commit)
+
+
+def _listener(session: Session) -> InvalidationListener | None:
+    listener: InvalidationListener | None = session.info.get(_LISTENER_KEY)
+    return listener
+
+
+def _payload(tables: set[str]) -> str:
+    payload = ",".join(sorted(tables))
+    if ANY_TABLE in tables or len(payload.encode()) > _MAX_PAYLOAD:
+        return ANY_TABLE
+    return payload
+
+
+def _on_before_commit(session: Session) -> None:
+    listener = _listener(session)
+    if listener is None or session.twophase or is_read_only_session(session):
+        return
+    # The final flush of the commit happens after before_commit
+    session.flush()
+    tables = written_tables(session)
+    if tables:
+        session.connection().execute(
+            select(func.pg_notify(listener.channel, _payload(tables)))
+        )
+
+
+def _on_after_commit(session: Session) -> None:
+    listener = _listener(session)
+    if (
+        listener is None
+        or not session.twophase
+        or is_read_only_session(session)
+    ):
+        return
+    tables = written_tables(session)
+    if tables:
+        listener.notify_later(set(tables))
+
+
+def _log_notify_error(task: asyncio.Task[None]) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(
+            "Invalidation notification failed", exc_info=task.exception()
+        )
@@ -0,0 +1,94 @@
+from typing import Any
+
+from sqlalchemy import Result, event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session, UOWTransaction
+
+from .connect import DBConnect
+from .writes import is_read_statement, mark_read_only
+
+AUTOCOMMIT = "AUTOCOMMIT"
+
+
+def read_only_execution_options(
+    deferrable: bool = False,
+    isolation_level: str | None = None,
+) -> dict[str, Any]:
+    """
+    Execution options of a connection that starts read-only transactions.
+    The options are sent along with BEGIN, so they cost no extra round trip.
+    """
+    options: dict[str, Any] = {
+        "postgresql_readonly": True,
+        "postgresql_deferrable": deferrable,
+    }
+    if isolation_level is not None:
+        options["isolation_level"] = isolation_level
+    return options
+
+
+async def create_read_only_session(
+    connect: DBConnect,
+    execution_options: dict[str, Any],
+) -> AsyncSession:
+    """
+    Creates a new session with read-only transactions.
+
+    With the AUTOCOMMIT isolation level, the session executes every
+        statement outside of a transaction and returns the connection to
+        the pool right after the statement.
+    """
+    if execution_options.get("isolation_level") != AUTOCOMMIT:
+        session = await connect.create_session(execution_options)
+    else:
+        # Releasing the connection ends the session transaction,
+        # loaded objects must stay usable after that.
+        session = await connect.create_session(
+            execution_options, expire_on_commit=False
+        )
+        event.listen(
+            session.sync_session,
+            "do_orm_execute",
+            _release_connection_after_statement,
+        )
+        event.listen(session.sync_session, "before_flush", _forbid_flush)
+
+    mark_read_only(session)
+    return session
+
+
+def _release_connection_after_statement(
+    orm_execute_state: ORMExecuteState,
+) -> Result[Any] | None:
+    # Statements are not in a transaction, so they can't be read-only
+    if not is_read_statement(orm_execute_state):
+        raise InvalidRequestError(
+            "Only SELECT is allowed in autocommit read session, mark "
+            "textual reads with the READ_STATEMENT execution option"
+        )
+    if orm_execute_state.execution_options.get("stream_results"):
+        # The connection is needed until the result is consumed
+        return None
+    if (
+        orm_execute_state.is_relationship_load
+        and orm_execute_state.lazy_loaded_from is None
+    ):
+        # Eager loads run while the parent statement is being loaded,
+        # the connection is released after the parent statement
+        return None
+
+    # AsyncSession buffers the rows, so they outlive the connection
+    result = orm_execute_state.invoke_statement()
+    # In AUTOCOMMIT mode, this only returns the connection to the pool
+    orm_execute_state.session.commit()
+    return result
+
+
+def _forbid_flush(
+    session: Session,
+    flush_context: UOWTransaction,
+    instances: object,
+) -> None:
+    if session.new or session.dirty or session.deleted:
+        raise InvalidRequestError("Writes are not allowed in read session")
@@ -0,0 +1,173 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from functools import wraps
+from typing import Any, TypeVar
+
+from sqlalchemy.exc import DBAPIError, InvalidRequestError
+
+from .connect import DBConnect
+from .run_in_new_context import run_in_new_ctx
+from .session import CurrentTransaction, atomic_db_session
+
+Result = TypeVar("Result")
+AsyncFunc = Callable[..., Awaitable[Result]]
+
+# serialization_failure and deadlock_detected
+RETRYABLE_SQLSTATES = frozenset({"40001", "40P01"})
+
+_retries: Counter[str] = Counter()
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Checks whether the error is a serialization failure or a deadlock,
+        after which the transaction can be safely run again
+    """
+    if not isinstance(error, DBAPIError):
+        return False
+    sqlstate = getattr(error.orig, "sqlstate", None) or getattr(
+        error.orig, "pgcode", None
+    )
+    return sqlstate in RETRYABLE_SQLSTATES
+
+
+def retry_atomic_db_session(
+    connect: DBConnect,
+    attempts: int = 5,
+    deadline: float | None = None,
+    base_delay: float = 0.01,
+    max_delay: float = 1.0,
+    current_transaction: CurrentTransaction = "commit",
+) -> Callable[[AsyncFunc[Result]], AsyncFunc[Result]]:
+    """
+    A decorator that runs the function inside atomic_db_session and runs
+        it again in a fresh transaction after a serialization failure or
+        a deadlock.
+
+    attempts: the maximum number of runs
+    deadline: seconds since the first run after which the function is
+        not retried anymore
+    base_delay, max_delay: the retries wait a random time up to
+        base_delay * 2 ** retry seconds, but no more than max_delay
+
+    current_transaction is handled as in atomic_db_session before the
+        first run. "append" and "nested" are not supported, as the work of
+        the open transaction would be lost on retry.
+
+    example of use:
+        @retry_atomic_db_session(connect, attempts=3, deadline=2.0)
+        async def transfer(...) -> None:
+            session = await db_session(connect)
+            ...
+    """
+    if current_transaction in {"append", "nested"}:
+        raise InvalidRequestError(
+            f"{current_transaction.capitalize()} transaction can't be retried"
+        )
+
+    def decorator(func: AsyncFunc[Result]) -> AsyncFunc[Result]:
+        call_site = _call_site(func)
+
+        async def run_atomic(*args: Any, **kwargs: Any) -> Result:
+            async with atomic_db_session(connect, current_transaction):
+                return await func(*args, **kwargs)
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Result:
+            return await _run_with_retries(
+                lambda: run_atomic(*args, **kwargs),
+                call_site,
+                attempts,
+                deadline,
+                base_delay,
+                max_delay,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def retry_in_new_ctx(
+    attempts: int = 5,
+    deadline: float | None = None,
+    base_delay: float = 0.01,
+    max_delay: float = 1.0,
+) -> Callable[[AsyncFunc[Result]], AsyncFunc[Result]]:
+    """
+    A decorator that runs the function with run_in_new_ctx and runs it
+        again in a new context after a serialization failure or a deadlock.
+    Parameters are the same as in retry_atomic_db_session.
+
+    example of use:
+        @retry_in_new_ctx(attempts=3)
+        async def your_function_with_db_session(...) -> None:
+            ...
+
+        await asyncio.gather(
+            your_function_with_db_session(...),
+            your_function_with_db_session(...),
+        )
+    """
+
+    def decorator(func: AsyncFunc[Result]) -> AsyncFunc[Result]:
+        call_site = _call_site(func)
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Result:
+            return await _run_with_retries(
+                lambda: run_in_new_ctx(func, *args, **kwargs),
+                call_site,
+                attempts,
+                deadline,
+                base_delay,
+                max_delay,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def retry_counters() -> dict[str, int]:
+    """
+    The number of retries made by the decorated functions so far,
+        keyed by "module.qualname" of the function
+    """
+    return dict(_retries)
+
+
+async def _run_with_retries(
+    run: Callable[[], Awaitable[Result]],
+    call_site: str,
+    attempts: int,
+    deadline: float | None,
+    base_delay: float,
+    max_delay: float,
+) -> Result:
+    started = time.monotonic()
+    retry = 0
+    while True:
+        try:
+            return await run()
+        except DBAPIError as error:  # noqa: PERF203
+            retry += 1
+            if not is_retryable_error(error) or retry >= attempts:
+                raise
+            delay = random.uniform(  # noqa: S311
+                0, min(max_delay, base_delay * 2**retry)
+            )
+            if (
+                deadline is not None
+                and time.monotonic() + delay - started > deadline
+            ):
+                raise
+            _retries[call_site] += 1
+            await asyncio.sleep(delay)
+
+
+def _call_site(func: Callable[..., Any]) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
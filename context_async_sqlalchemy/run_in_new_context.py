@@ -4,7 +4,7 @@ from contextvars import copy_context
 from typing import Any, TypeVar
 
 from .auto_commit import commit_all_sessions, rollback_all_sessions
-from .context import init_db_session_ctx, reset_db_session_ctx
+from .context import finalize_db_session_ctx, init_db_session_ctx
 
 AsyncCallableResult = TypeVar("AsyncCallableResult")
 AsyncCallable = Callable[..., Awaitable[AsyncCallableResult]]
@@ -46,10 +46,9 @@ async def _new_ctx_wrapper(
     token = init_db_session_ctx(force=True)
     try:
         result = await callable_func(*args, **kwargs)
-        await commit_all_sessions()
-        return result
-    except Exception:
-        await rollback_all_sessions()
+    except BaseException:
+        await finalize_db_session_ctx(token, rollback_all_sessions)
         raise
-    finally:
-        await reset_db_session_ctx(token)
+    # Cancellation can't interrupt the commit and leave sessions unclosed
+    await finalize_db_session_ctx(token, commit_all_sessions)
+    return result
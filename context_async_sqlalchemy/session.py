@@ -5,12 +5,26 @@ from typing import Literal
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .caching import memoize_queries
 from .connect import DBConnect
 from .context import (
     get_db_session_from_context,
+    get_deadline_ctx,
+    get_read_only_ctx,
+    get_route_name_ctx,
+    is_context_finalized,
     pop_db_session_from_context,
     put_db_session_to_context,
 )
+from .deadline import apply_deadline
+from .idle import watch_idle_transactions
+from .lazy_loads import batch_lazy_loads
+from .leaks import report_late_session, track_connections
+from .read_only import (
+    AUTOCOMMIT,
+    create_read_only_session,
+    read_only_execution_options,
+)
 
 
 async def db_session(connect: DBConnect) -> AsyncSession:
@@ -23,23 +37,64 @@ async def db_session(connect: DBConnect) -> AsyncSession:
     """
     session = get_db_session_from_context(connect)
     if not session:
-        session = await connect.create_session()
+        if is_context_finalized():
+            report_late_session(close=connect.late_sessions == "close")
+        session = await _create_ctx_session(connect)
         put_db_session_to_context(connect, session)
     return session
 
 
-_current_transaction_choices = Literal[
+async def _create_ctx_session(connect: DBConnect) -> AsyncSession:
+    session = await _create_session(connect)
+    if connect.memoize_queries:
+        memoize_queries(session)
+    if connect.batch_lazy_loads:
+        batch_lazy_loads(session)
+    if connect.finalization_timeout is not None:
+        track_connections(session)
+    deadline = get_deadline_ctx()
+    if deadline is not None:
+        apply_deadline(session, deadline)
+    if (
+        connect.idle_in_transaction_warning is not None
+        or connect.idle_in_transaction_timeout is not None
+    ):
+        watch_idle_transactions(
+            session,
+            connect.idle_in_transaction_warning,
+            connect.idle_in_transaction_timeout,
+            get_route_name_ctx(),
+        )
+    return session
+
+
+async def _create_session(connect: DBConnect) -> AsyncSession:
+    read_only_options = get_read_only_ctx()
+    if read_only_options is None and connect.autocommit_read:
+        read_only_options = read_only_execution_options(
+            isolation_level=AUTOCOMMIT
+        )
+    elif read_only_options is None and connect.read_only:
+        read_only_options = read_only_execution_options()
+    if read_only_options is None:
+        return await connect.create_session()
+    return await create_read_only_session(connect, read_only_options)
+
+
+# The ways to handle the current transaction, see atomic_db_session
+CurrentTransaction = Literal[
     "commit",
     "rollback",
     "append",
     "raise",
+    "nested",
 ]
 
 
 @asynccontextmanager
 async def atomic_db_session(
     connect: DBConnect,
-    current_transaction: _current_transaction_choices = "commit",
+    current_transaction: CurrentTransaction = "commit",
 ) -> AsyncGenerator[AsyncSession]:
     """
     A context manager that you can use to wrap another function which
@@ -53,6 +108,9 @@ async def atomic_db_session(
         "rollback" - rolls back the open transaction and starts a new one
         "append" - continues using the current transaction and commits it
         "raise" - raises an InvalidRequestError
+        "nested" - runs in a savepoint of the current transaction
+            (starting it if needed). An error rolls back only the savepoint,
+            the transaction continues and is committed with the rest.
 
     example of use:
         async with atomic_db_session(connect) as session
@@ -71,6 +129,9 @@ async def atomic_db_session(
             raise
         else:
             await session.commit()
+    elif current_transaction == "nested":
+        async with session.begin_nested():
+            yield session
     else:
         async with session.begin():
             yield session
@@ -78,7 +139,7 @@ async def atomic_db_session(
 
 async def _handle_existing_transaction(
     session: AsyncSession,
-    current_transaction: _current_transaction_choices,
+    current_transaction: CurrentTransaction,
 ) -> None:
     if not session.in_transaction():
         return
@@ -130,6 +191,7 @@ async def close_db_session(connect: DBConnect) -> None:
     session = pop_db_session_from_context(connect)
     if session:
         await session.close()
+        connect.release_session(session)
 
 
 @asynccontextmanager
@@ -148,6 +210,25 @@ async def new_non_ctx_session(
         yield session
 
 
+@asynccontextmanager
+async def new_non_ctx_read_only_session(
+    connect: DBConnect,
+    deferrable: bool = False,
+    isolation_level: str | None = None,
+) -> AsyncGenerator[AsyncSession]:
+    """
+    Creating a new session with a read-only transaction without using
+        a context. The transaction is rolled back at the end.
+
+    example of use:
+        async with new_non_ctx_read_only_session(connect) as session:
+            await session.execute(...)
+    """
+    options = read_only_execution_options(deferrable, isolation_level)
+    async with await create_read_only_session(connect, options) as session:
+        yield session
+
+
 @asynccontextmanager
 async def new_non_ctx_atomic_session(
     connect: DBConnect,
@@ -16,10 +16,13 @@ from ..auto_commit import (
     rollback_all_sessions,
 )
 from ..context import (
+    finalize_db_session_ctx,
     init_db_session_ctx,
     is_context_initiated,
-    reset_db_session_ctx,
+    set_deadline_ctx,
+    set_request_scope_ctx,
 )
+from ..deadline import request_timeout
 
 Message = MutableMapping[str, Any]
 Receive = Callable[[], Awaitable[Message]]
@@ -31,10 +34,19 @@ ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
 def add_starlette_http_db_session_middleware(
     app: Starlette,
     before_commit: BeforeCommitCallback | None = None,
+    concurrent_finalization: bool = False,
+    two_phase_commit: bool = False,
+    timeout: float | None = None,
+    timeout_header: str | None = None,
 ) -> None:
     """Adds middleware to the application"""
     app.add_middleware(
-        StarletteHTTPDBSessionMiddleware, before_commit=before_commit
+        StarletteHTTPDBSessionMiddleware,
+        before_commit=before_commit,
+        concurrent_finalization=concurrent_finalization,
+        two_phase_commit=two_phase_commit,
+        timeout=timeout,
+        timeout_header=timeout_header,
     )
 
 
@@ -46,9 +58,17 @@ class StarletteHTTPDBSessionMiddleware(BaseHTTPMiddleware):
         app: ASGIApp,
         dispatch: DispatchFunction | None = None,
         before_commit: BeforeCommitCallback | None = None,
+        concurrent_finalization: bool = False,
+        two_phase_commit: bool = False,
+        timeout: float | None = None,
+        timeout_header: str | None = None,
     ):
         super().__init__(app, dispatch=dispatch)
         self._before_commit = before_commit
+        self._concurrent_finalization = concurrent_finalization
+        self._two_phase_commit = two_phase_commit
+        self._timeout = timeout
+        self._timeout_header = timeout_header
 
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
@@ -57,6 +77,10 @@ class StarletteHTTPDBSessionMiddleware(BaseHTTPMiddleware):
             request,
             call_next,
             before_commit=self._before_commit,
+            concurrent_finalization=self._concurrent_finalization,
+            two_phase_commit=self._two_phase_commit,
+            timeout=self._timeout,
+            timeout_header=self._timeout_header,
         )
 
 
@@ -64,6 +88,10 @@ async def starlette_http_db_session_middleware(
     request: Request,
     call_next: RequestResponseEndpoint,
     before_commit: BeforeCommitCallback | None = None,
+    concurrent_finalization: bool = False,
+    two_phase_commit: bool = False,
+    timeout: float | None = None,
+    timeout_header: str | None = None,
 ) -> Response:
     """
     Database session lifecycle management.
@@ -73,6 +101,18 @@ async def starlette_http_db_session_middleware(
         the response status is < 400. Otherwise, a rollback is performed.
 
     But you can commit or rollback manually in the handler.
+
+    concurrent_finalization: commit, roll back and close sessions
+        of different connections concurrently (see DBConnect commit_order)
+
+    two_phase_commit: commit sessions of different connections atomically
+        using two-phase commit (see commit_all_sessions)
+
+    timeout: the time budget of a request in seconds (see set_deadline_ctx)
+
+    timeout_header: the name of the header with the time budget of
+        a request in milliseconds. The smaller of the header value and
+        timeout is used.
     """
     # Tests have different session management rules
     # so if the context variable is already set, we do nothing
@@ -84,18 +124,37 @@ async def starlette_http_db_session_middleware(
     # session first, the container itself is shared, and this coroutine will
     # add the session to container = shared context.
     token = init_db_session_ctx()
+    set_request_scope_ctx(request.scope)
+    header_value = (
+        request.headers.get(timeout_header) if timeout_header else None
+    )
+    request_budget = request_timeout(timeout, header_value)
+    if request_budget is not None:
+        set_deadline_ctx(request_budget)
+
+    async def rollback() -> None:
+        await rollback_all_sessions(concurrently=concurrent_finalization)
+
+    # Finalization closes all sessions and clears the context.
+    # It is shielded from cancellation, so that no session is left
+    # with a checked out connection.
     try:
         response = await call_next(request)
+    except BaseException:
+        # If an exception occurs, we roll all sessions back
+        await finalize_db_session_ctx(token, rollback, concurrent_finalization)
+        raise
+
+    async def commit_or_rollback() -> None:
         # using the status code, we decide to commit or rollback all sessions
         await auto_commit_by_status_code(
             status_code=response.status_code,
             before_commit=before_commit,
+            concurrently=concurrent_finalization,
+            two_phase=two_phase_commit,
         )
-        return response
-    except Exception:
-        # If an exception occurs, we roll all sessions back
-        await rollback_all_sessions()
-        raise
-    finally:
-        # Close all sessions and clear the context
-        await reset_db_session_ctx(token)
+
+    await finalize_db_session_ctx(
+        token, commit_or_rollback, concurrent_finalization
+    )
+    return response
@@ -0,0 +1,222 @@
+"""Tracking of writes made through a session"""
+
+from collections.abc import Callable
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Connection, event
+from sqlalchemy.engine import ExecutionContext
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    ORMExecuteState,
+    Session,
+    SessionTransaction,
+    UOWTransaction,
+    object_mapper,
+)
+from sqlalchemy.sql import TableClause
+from sqlalchemy.sql.elements import (
+    ReleaseSavepointClause,
+    RollbackToSavepointClause,
+    SavepointClause,
+)
+
+# Written tables are unknown, for example, after a textual statement
+ANY_TABLE = "*"
+
+# The execution option that marks a textual statement as a read
+READ_STATEMENT = "read_statement"
+
+_WRITES_KEY = "context_async_sqlalchemy.writes"
+_COMMITTING_KEY = "context_async_sqlalchemy.committing"
+_READ_ONLY_KEY = "context_async_sqlalchemy.read_only"
+_WRITE_LISTENERS_KEY = "context_async_sqlalchemy.write_listeners"
+
+# Called with the session and the tables it has just written
+WriteListener = Callable[[Session, set[str]], None]
+
+_SAVEPOINT_CLAUSES = (
+    SavepointClause,
+    ReleaseSavepointClause,
+    RollbackToSavepointClause,
+)
+
+# The tracked sessions by the connections of their transactions
+_sessions: WeakKeyDictionary[Connection, Session] = WeakKeyDictionary()
+
+
+def track_writes(session: AsyncSession) -> None:
+    """
+    Starts tracking the tables written in the current transaction of the
+        session: DML statements, flushes, and statements that are not
+        known to be SELECT (textual SQL, DDL).
+    Statements are tracked on the connection of the transaction, so the
+        ones executed with session.connection() are seen too.
+    """
+    session.info.setdefault(_WRITES_KEY, set())
+    sync_session = session.sync_session
+    if event.contains(sync_session, "after_begin", _on_begin):
+        return
+    event.listen(sync_session, "after_begin", _on_begin)
+    event.listen(sync_session, "after_flush", _on_flush)
+    event.listen(sync_session, "before_commit", _on_before_commit)
+    event.listen(sync_session, "after_transaction_end", _on_transaction_end)
+
+
+def session_has_writes(session: AsyncSession) -> bool:
+    """
+    Checks whether anything was written in the current transaction of the
+        session. If the session is not tracked, it is assumed that it was.
+    """
+    return bool(written_tables(session))
+
+
+def written_tables(session: AsyncSession | Session) -> set[str]:
+    """
+    Names of the tables written in the current transaction of the session.
+    ANY_TABLE means that the written tables are unknown.
+    If the session is not tracked, {ANY_TABLE} is returned.
+    """
+    tables: set[str] | None = session.info.get(_WRITES_KEY)
+    if tables is None:
+        return {ANY_TABLE}
+    return tables
+
+
+def record_writes(session: AsyncSession | Session, tables: set[str]) -> None:
+    """
+    Records the tables written through the session bypassing the ORM, for
+        example, with the driver connection. Does nothing if the session
+        is not tracked.
+    """
+    if isinstance(session, AsyncSession):
+        session = session.sync_session
+    _add_writes(session, tables)
+
+
+def listen_writes(session: AsyncSession, listener: WriteListener) -> None:
+    """
+    Calls the listener every time the tracked session writes to tables,
+        with the names of the tables, including the writes of the
+        statements executed with session.connection().
+    """
+    listeners: list[WriteListener] = session.info.setdefault(
+        _WRITE_LISTENERS_KEY, []
+    )
+    if listener not in listeners:
+        listeners.append(listener)
+
+
+def statement_written_tables(orm_execute_state: ORMExecuteState) -> set[str]:
+    """
+    Names of the tables written by the executed statement, empty for
+        SELECT and READ_STATEMENT. ANY_TABLE means that the written tables
+        are unknown.
+    """
+    if is_read_statement(orm_execute_state):
+        return set()
+    return _statement_written_tables(orm_execute_state.statement)
+
+
+def mark_read_only(session: AsyncSession) -> None:
+    """Marks the session as one with read-only transactions"""
+    session.info[_READ_ONLY_KEY] = True
+
+
+def is_read_only_session(session: AsyncSession | Session) -> bool:
+    """
+    Checks whether the session was created with read-only transactions
+        (including autocommit read)
+    """
+    return session.info.get(_READ_ONLY_KEY) is True
+
+
+def is_read_statement(orm_execute_state: ORMExecuteState) -> bool:
+    """
+    Whether the statement only reads: a SELECT construct or a statement
+        executed with the READ_STATEMENT option
+    """
+    return orm_execute_state.is_select or bool(
+        orm_execute_state.execution_options.get(READ_STATEMENT)
+    )
+
+
+def flushed_tables(session: Session) -> set[str]:
+    """Names of the tables written by the flush in progress"""
+    changed: list[Any] = [*session.new, *session.deleted]
+    changed.extend(obj for obj in session.dirty if session.is_modified(obj))
+    return {
+        table.name for obj in changed for table in object_mapper(obj).tables
+    }
+
+
+def _statement_written_tables(statement: Any) -> set[str]:
+    if getattr(statement, "is_select", False):
+        return set()
+    table = getattr(statement, "table", None)
+    if getattr(statement, "is_dml", False) and isinstance(table, TableClause):
+        return {table.name}
+    return {ANY_TABLE}
+
+
+def _on_begin(
+    session: Session,
+    transaction: SessionTransaction,
+    connection: Connection,
+) -> None:
+    if session.info.get(_WRITES_KEY) is None:
+        return
+    _sessions[connection] = session
+    if not event.contains(connection, "before_cursor_execute", _on_execute):
+        event.listen(connection, "before_cursor_execute", _on_execute)
+
+
+def _on_execute(
+    connection: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: ExecutionContext | None,
+    executemany: bool,
+) -> None:
+    session = _sessions.get(connection)
+    if session is None or session.info.get(_COMMITTING_KEY):
+        # Statements of the commit itself (the final flush is tracked by
+        # after_flush, and PREPARE TRANSACTION is not a write)
+        return
+    if context is not None and context.execution_options.get(READ_STATEMENT):
+        return
+    compiled = getattr(context, "compiled", None)
+    if compiled is None:
+        # exec_driver_sql
+        _add_writes(session, {ANY_TABLE})
+    elif not isinstance(compiled.statement, _SAVEPOINT_CLAUSES):
+        _add_writes(session, _statement_written_tables(compiled.statement))
+
+
+def _on_flush(session: Session, flush_context: UOWTransaction) -> None:
+    _add_writes(session, flushed_tables(session))
+
+
+def _add_writes(session: Session, tables: set[str]) -> None:
+    written: set[str] | None = session.info.get(_WRITES_KEY)
+    if written is None or not tables:
+        return
+    written.update(tables)
+    for listener in session.info.get(_WRITE_LISTENERS_KEY, ()):
+        listener(session, tables)
+
+
+def _on_before_commit(session: Session) -> None:
+    if session.info.get(_WRITES_KEY) is not None:
+        session.info[_COMMITTING_KEY] = True
+
+
+def _on_transaction_end(
+    session: Session, transaction: SessionTransaction
+) -> None:
+    # before_commit is also called for savepoints
+    session.info.pop(_COMMITTING_KEY, None)
+    tables = session.info.get(_WRITES_KEY)
+    if tables is not None and transaction.parent is None:
+        tables.clear()
@@ -11,6 +11,8 @@ from starlette.middleware.base import RequestResponseEndpoint
 from starlette.requests import Request
 from starlette.responses import Response
 
+from context_async_sqlalchemy import READ_STATEMENT
+
 
 class _LsnHolder:
     """
@@ -52,11 +54,14 @@ async def get_current_lsn_if_there_writes(session: AsyncSession) -> str | None:
     # pg_current_xact_id_if_assigned() returns NULL if:
     #   - session contained only SELECT (XID is not assigned)
     #   - read-only session to replica
+    # READ_STATEMENT: the textual query is a read, so it is not tracked
+    # as a write that would invalidate the caches
     result = await session.execute(
         text(
             "SELECT pg_current_wal_lsn()::text "
             "WHERE pg_current_xact_id_if_assigned() IS NOT NULL"
-        )
+        ),
+        execution_options={READ_STATEMENT: True},
     )
     return result.scalar()
 
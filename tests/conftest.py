@@ -3,12 +3,19 @@ Basic settings and fixtures for testing
 """
 
 from collections.abc import AsyncGenerator
+from typing import Any
 
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from context_async_sqlalchemy import DBConnect
 from context_async_sqlalchemy.test_utils import rollback_session
-from examples.database import connection
+from examples.database import (
+    connection,
+    create_engine,
+    create_session_maker,
+)
+from tests.helpers import ConnectionFactory
 
 
 @pytest_asyncio.fixture
@@ -16,3 +23,36 @@ async def db_session_test() -> AsyncGenerator[AsyncSession]:
     """The session that is used inside the test"""
     async with rollback_session(connection) as session:
         yield session
+
+
+@pytest_asyncio.fixture
+async def close_connection() -> AsyncGenerator[None]:
+    """
+    Closes the engine after the test, so that its connections are not
+        reused by the event loop of the next test
+    """
+    yield
+    await connection.close()
+
+
+@pytest_asyncio.fixture
+async def make_connection() -> AsyncGenerator[ConnectionFactory]:
+    """
+    Creates connections to the test database with the given DBConnect
+        options and closes them after the test
+    """
+    connections: list[DBConnect] = []
+
+    def make(**kwargs: Any) -> DBConnect:
+        connect = DBConnect(
+            engine_creator=create_engine,
+            session_maker_creator=create_session_maker,
+            host="127.0.0.1",
+            **kwargs,
+        )
+        connections.append(connect)
+        return connect
+
+    yield make
+    for connect in connections:
+        await connect.close()
@@ -0,0 +1,38 @@
+"""
+Helpers for tests that look at what a connection does with the database
+"""
+
+from collections.abc import Callable
+from typing import Any, cast
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from context_async_sqlalchemy import DBConnect
+
+# Creates a connection with the given DBConnect options, see make_connection
+ConnectionFactory = Callable[..., DBConnect]
+
+
+async def engine_of(connect: DBConnect) -> AsyncEngine:
+    """The engine of the connection, it connects if it's not connected"""
+    session_maker = await connect.session_maker()
+    return cast("AsyncEngine", session_maker.kw["bind"])
+
+
+async def checked_out_connections(connect: DBConnect) -> int:
+    """The number of database connections of the connection in use"""
+    engine = await engine_of(connect)
+    return engine.pool.checkedout()  # type: ignore[attr-defined,no-any-return]
+
+
+async def record_statements(connect: DBConnect) -> list[str]:
+    """Returns the list that the executed statements are appended to"""
+    statements: list[str] = []
+
+    def on_statement(*args: Any) -> None:
+        statements.append(args[2])
+
+    engine = await engine_of(connect)
+    event.listen(engine.sync_engine, "before_cursor_execute", on_statement)
+    return statements
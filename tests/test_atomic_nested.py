@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from context_async_sqlalchemy import (
+    atomic_db_session,
+    commit_all_sessions,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from examples.database import connection
+from examples.models import ExampleTable
+
+pytestmark = pytest.mark.usefixtures("close_connection")
+
+
+async def _insert(value: str) -> None:
+    session = await db_session(connection)
+    await session.execute(insert(ExampleTable).values(text=value))
+
+
+async def _count_and_clean(value: str) -> int:
+    session = await db_session(connection)
+    count = await session.scalar(
+        select(func.count()).where(ExampleTable.text == value)
+    )
+    await session.execute(
+        delete(ExampleTable).where(ExampleTable.text == value)
+    )
+    await session.commit()
+    return int(count or 0)
+
+
+async def test_nested_failure_rolls_back_only_savepoint() -> None:
+    token = init_db_session_ctx()
+    await _insert("outer")
+
+    with pytest.raises(ValueError, match="inner"):
+        async with atomic_db_session(connection, "nested"):
+            await _insert("inner")
+            raise ValueError("inner")
+
+    async with atomic_db_session(connection, "nested") as session:
+        await _insert("inner")
+
+    assert session.in_transaction()
+    await commit_all_sessions()
+    assert await _count_and_clean("outer") == 1
+    assert await _count_and_clean("inner") == 1
+    await reset_db_session_ctx(token)
+
+
+async def test_nested_starts_transaction() -> None:
+    token = init_db_session_ctx()
+
+    async with atomic_db_session(connection, "nested") as session:
+        await _insert("inner")
+
+    assert session.in_transaction()
+    await session.rollback()
+    assert await _count_and_clean("inner") == 0
+    await reset_db_session_ctx(token)
@@ -3,7 +3,14 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
+from context_async_sqlalchemy import (
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
 from context_async_sqlalchemy.connect import DBConnect
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory
 
 
 def _make_engine() -> MagicMock:
@@ -130,3 +137,89 @@ async def test_before_create_session_handler_repeats() -> None:
     await conn.session_maker()
 
     assert handler.await_count == 2
+
+
+async def test_session_pool_disabled_by_default(
+    make_connection: ConnectionFactory,
+) -> None:
+    conn = make_connection()
+    session = await conn.create_session()
+    await session.close()
+    conn.release_session(session)
+
+    assert await conn.create_session() is not session
+
+
+async def test_session_pool_reuses_released_session(
+    make_connection: ConnectionFactory,
+) -> None:
+    conn = make_connection(session_pool_size=2)
+    session = await conn.create_session()
+    session.info["some"] = "value"
+    await session.close()
+    conn.release_session(session)
+
+    reused = await conn.create_session()
+
+    assert reused is session
+    assert reused.info == {}
+    assert await conn.create_session() is not session
+
+
+async def test_session_pool_is_bounded(
+    make_connection: ConnectionFactory,
+) -> None:
+    conn = make_connection(session_pool_size=1)
+    first = await conn.create_session()
+    second = await conn.create_session()
+    conn.release_session(first)
+    conn.release_session(second)
+
+    assert await conn.create_session() is first
+    assert await conn.create_session() is not second
+
+
+async def test_session_pool_drops_dirty_session(
+    make_connection: ConnectionFactory,
+) -> None:
+    conn = make_connection(session_pool_size=2)
+    session = await conn.create_session()
+    session.add(ExampleTable(text="not flushed"))
+    conn.release_session(session)
+
+    assert await conn.create_session() is not session
+
+
+async def test_session_pool_drops_foreign_session(
+    make_connection: ConnectionFactory,
+) -> None:
+    conn = make_connection(session_pool_size=2)
+    session_maker = await conn.session_maker()
+    session = session_maker()
+    conn.release_session(session)
+
+    assert await conn.create_session() is not session
+
+
+async def test_session_pool_drops_session_of_old_engine(
+    make_connection: ConnectionFactory,
+) -> None:
+    conn = make_connection(session_pool_size=2)
+    session = await conn.create_session()
+    await conn.change_host("localhost")
+    conn.release_session(session)
+
+    assert await conn.create_session() is not session
+
+
+async def test_reset_ctx_returns_session_to_pool(
+    make_connection: ConnectionFactory,
+) -> None:
+    conn = make_connection(session_pool_size=2)
+    token = init_db_session_ctx()
+    session = await db_session(conn)
+    await reset_db_session_ctx(token)
+
+    token = init_db_session_ctx()
+    assert await db_session(conn) is session
+    await reset_db_session_ctx(token)
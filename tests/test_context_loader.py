@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+from collections.abc import AsyncGenerator
+
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    context_loader,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, record_statements
+
+
+@pytest_asyncio.fixture
+async def loader_ctx(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, AsyncSession, list[str]]]:
+    connection = make_connection()
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    statements = await record_statements(connection)
+
+    yield connection, session, statements
+
+    await session.rollback()
+    await reset_db_session_ctx(token)
+
+
+async def _insert(session: AsyncSession, count: int) -> list[uuid.UUID]:
+    result = await session.execute(
+        insert(ExampleTable).returning(ExampleTable.id),
+        [{"text": "loader"}] * count,
+    )
+    return list(result.scalars())
+
+
+async def test_lookups_are_batched(
+    loader_ctx: tuple[DBConnect, AsyncSession, list[str]],
+) -> None:
+    connection, session, statements = loader_ctx
+    ids = await _insert(session, 3)
+    missing = uuid.uuid4()
+    loader = context_loader(connection, ExampleTable)
+    statements.clear()
+
+    rows = await asyncio.gather(*(loader.load(id_) for id_ in [*ids, missing]))
+
+    assert [row.id for row in rows[:3] if row is not None] == ids
+    assert rows[3] is None
+    assert len(statements) == 1
+    assert "ANY" in statements[0]
+
+
+async def test_loaded_objects_are_remembered(
+    loader_ctx: tuple[DBConnect, AsyncSession, list[str]],
+) -> None:
+    connection, session, statements = loader_ctx
+    ids = await _insert(session, 2)
+    statements.clear()
+
+    first = await context_loader(connection, ExampleTable).load_many(ids)
+    second = await context_loader(connection, ExampleTable).load_many(ids)
+
+    assert first == second
+    assert len(statements) == 1
+
+
+async def test_later_lookups_make_a_new_batch(
+    loader_ctx: tuple[DBConnect, AsyncSession, list[str]],
+) -> None:
+    connection, session, statements = loader_ctx
+    ids = await _insert(session, 2)
+    loader = context_loader(connection, ExampleTable)
+    statements.clear()
+
+    await loader.load(ids[0])
+    await loader.load(ids[1])
+    loader.clear()
+    await loader.load(ids[0])
+
+    assert len(statements) == 3
+
+
+async def test_cancelled_batch_is_repeated(
+    loader_ctx: tuple[DBConnect, AsyncSession, list[str]],
+) -> None:
+    connection, session, _ = loader_ctx
+    ids = await _insert(session, 2)
+    loader = context_loader(connection, ExampleTable)
+
+    first = asyncio.ensure_future(loader.load(ids[0]))
+    second = asyncio.ensure_future(loader.load(ids[1]))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    row = await second
+    assert row is not None
+    assert row.id == ids[1]
+
+
+async def test_loaders_are_discarded_with_context(
+    make_connection: ConnectionFactory,
+) -> None:
+    connection = make_connection()
+    token = init_db_session_ctx()
+    loader = context_loader(connection, ExampleTable)
+    await reset_db_session_ctx(token)
+
+    token = init_db_session_ctx()
+    assert context_loader(connection, ExampleTable) is not loader
+    await reset_db_session_ctx(token)
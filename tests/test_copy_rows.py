@@ -0,0 +1,71 @@
+from collections.abc import AsyncGenerator, AsyncIterator
+
+import pytest_asyncio
+from sqlalchemy import func, select
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    copy_rows,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+    session_has_writes,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory
+
+COUNT = select(func.count()).where(ExampleTable.text.like("copy%"))
+
+
+@pytest_asyncio.fixture
+async def copy_ctx(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[DBConnect]:
+    connection = make_connection(skip_commit_without_writes=True)
+    token = init_db_session_ctx()
+
+    yield connection
+
+    session = await db_session(connection)
+    await session.rollback()
+    await reset_db_session_ctx(token)
+
+
+async def test_rows_are_copied_in_the_transaction(
+    copy_ctx: DBConnect,
+) -> None:
+    session = await db_session(copy_ctx)
+    rows = [(f"copy {i}",) for i in range(1000)]
+
+    count = await copy_rows(session, ExampleTable, rows, columns=["text"])
+
+    assert count == 1000
+    assert await session.scalar(COUNT) == 1000
+    assert session_has_writes(session)
+
+    await session.rollback()
+    assert await session.scalar(COUNT) == 0
+
+
+async def test_async_iterable_is_streamed(copy_ctx: DBConnect) -> None:
+    session = await db_session(copy_ctx)
+
+    async def rows() -> AsyncIterator[tuple[str]]:
+        for i in range(10):
+            yield (f"copy {i}",)
+
+    count = await copy_rows(
+        session, ExampleTable.__table__, rows(), columns=["text"]
+    )
+
+    assert count == 10
+    assert await session.scalar(COUNT) == 10
+
+
+async def test_pending_objects_are_flushed_first(copy_ctx: DBConnect) -> None:
+    session = await db_session(copy_ctx)
+    session.add(ExampleTable(text="copy pending"))
+
+    await copy_rows(session, ExampleTable, [("copy",)], columns=["text"])
+
+    assert await session.scalar(COUNT) == 2
@@ -0,0 +1,109 @@
+import uuid
+from collections.abc import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, insert, select
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    db_batch,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from context_async_sqlalchemy.batch import is_plain_insert
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, record_statements
+
+COUNT = select(func.count()).where(ExampleTable.text == "batch")
+
+
+@pytest_asyncio.fixture
+async def batch_ctx(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, list[str]]]:
+    connection = make_connection()
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    statements = await record_statements(connection)
+
+    yield connection, statements
+
+    await session.rollback()
+    await reset_db_session_ctx(token)
+
+
+async def test_results_are_in_order(
+    batch_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = batch_ctx
+    statement = insert(ExampleTable)
+
+    async with db_batch(connection) as batch:
+        indexes = [batch.add(COUNT)]
+        indexes.extend(
+            batch.add(statement, {"text": "batch"}) for _ in range(3)
+        )
+        indexes.append(batch.add(COUNT))
+
+    assert indexes == [0, 1, 1, 1, 2]
+    assert len(batch.results) == 3
+    assert batch.results[0].scalar() == 0
+    assert batch.results[2].scalar() == 3
+    assert len(statements) == 3
+
+
+async def test_different_inserts_are_not_joined(
+    batch_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = batch_ctx
+
+    returning = insert(ExampleTable).returning(ExampleTable.id)
+
+    async with db_batch(connection) as batch:
+        batch.add(insert(ExampleTable), {"text": "batch"})
+        batch.add(insert(ExampleTable), {"text": "batch"})
+        index = batch.add(returning, {"text": "batch"})
+        batch.add(returning, {"text": "batch"})
+        batch.add(insert(ExampleTable).values(text="batch"))
+
+    assert batch.results[index].scalar() is not None
+    assert len(statements) == 5
+
+
+async def test_parameters_with_other_keys_are_not_joined(
+    batch_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = batch_ctx
+    statement = insert(ExampleTable)
+
+    async with db_batch(connection) as batch:
+        first = batch.add(statement, {"text": "batch"})
+        second = batch.add(statement, {"text": "batch", "id": uuid.uuid4()})
+        third = batch.add(statement, {"text": "batch", "id": uuid.uuid4()})
+
+    assert first != second == third
+    assert len(statements) == 2
+    session = await db_session(connection)
+    assert await session.scalar(COUNT) == 3
+
+
+def test_plain_insert() -> None:
+    assert is_plain_insert(insert(ExampleTable))
+    assert not is_plain_insert(insert(ExampleTable).returning(ExampleTable.id))
+    assert not is_plain_insert(COUNT)
+
+
+async def test_nothing_is_executed_on_error(
+    batch_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = batch_ctx
+
+    with pytest.raises(ValueError, match="stop"):
+        async with db_batch(connection) as batch:
+            batch.add(COUNT)
+            raise ValueError("stop")
+
+    assert batch.results == []
+    assert statements == []
@@ -0,0 +1,150 @@
+import asyncio
+from typing import Any
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from context_async_sqlalchemy import (
+    READ_STATEMENT,
+    ASGIHTTPDBSessionMiddleware,
+    DeadlineExceededError,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+    set_autocommit_read_ctx,
+    set_deadline_ctx,
+)
+from context_async_sqlalchemy.context import get_deadline_ctx
+from context_async_sqlalchemy.deadline import request_timeout
+from examples.database import connection
+from tests.helpers import record_statements
+
+pytestmark = pytest.mark.usefixtures("close_connection")
+
+
+async def _timeouts() -> tuple[int, int]:
+    session = await db_session(connection)
+    result = await session.execute(
+        text(
+            "SELECT current_setting('statement_timeout'),"
+            " current_setting('lock_timeout')"
+        )
+    )
+    statement_timeout, lock_timeout = result.one()
+    return int(statement_timeout[:-2]), int(lock_timeout[:-2])
+
+
+async def test_timeouts_are_set_at_transaction_start() -> None:
+    token = init_db_session_ctx()
+    set_deadline_ctx(5)
+
+    statement_timeout, lock_timeout = await _timeouts()
+
+    assert 4000 < statement_timeout <= 5000
+    assert lock_timeout == statement_timeout
+    await reset_db_session_ctx(token)
+
+
+async def test_earlier_deadline_is_kept() -> None:
+    token = init_db_session_ctx()
+    set_deadline_ctx(1)
+    deadline = get_deadline_ctx()
+
+    set_deadline_ctx(10)
+
+    assert get_deadline_ctx() == deadline
+    await reset_db_session_ctx(token)
+
+
+async def test_long_statement_is_cancelled() -> None:
+    token = init_db_session_ctx()
+    set_deadline_ctx(0.1)
+    session = await db_session(connection)
+
+    with pytest.raises(DBAPIError, match="statement timeout"):
+        await session.execute(text("SELECT pg_sleep(1)"))
+    await reset_db_session_ctx(token)
+
+
+async def test_exhausted_budget_fails_fast() -> None:
+    token = init_db_session_ctx()
+    set_deadline_ctx(0.01)
+    session = await db_session(connection)
+    await asyncio.sleep(0.02)
+
+    with pytest.raises(DeadlineExceededError):
+        await session.execute(text("SELECT 1"))
+    await reset_db_session_ctx(token)
+
+
+async def test_huge_deadline_is_capped() -> None:
+    token = init_db_session_ctx()
+    set_deadline_ctx(1e300)
+
+    statement_timeout, lock_timeout = await _timeouts()
+
+    assert statement_timeout == lock_timeout == 2**31 - 1
+    await reset_db_session_ctx(token)
+
+
+async def test_timeouts_are_not_set_in_autocommit() -> None:
+    token = init_db_session_ctx()
+    set_deadline_ctx(5)
+    set_autocommit_read_ctx()
+    session = await db_session(connection)
+    statements = await record_statements(connection)
+
+    await session.execute(
+        text("SELECT 1"), execution_options={READ_STATEMENT: True}
+    )
+    await session.execute(
+        text("SELECT 2"), execution_options={READ_STATEMENT: True}
+    )
+
+    assert statements == ["SELECT 1", "SELECT 2"]
+    await reset_db_session_ctx(token)
+
+
+@pytest.mark.parametrize(
+    ("timeout", "header_value", "expected"),
+    [
+        (None, None, None),
+        (2.0, None, 2.0),
+        (None, "500", 0.5),
+        (2.0, "500", 0.5),
+        (0.1, "500", 0.1),
+        (2.0, "soon", 2.0),
+        (2.0, "nan", 2.0),
+        (2.0, "inf", 2.0),
+        (2.0, "-inf", 2.0),
+        (2.0, "1e400", 2.0),
+        (2.0, "0", 2.0),
+        (2.0, "-500", 2.0),
+        (None, "nan", None),
+        (None, "1e400", None),
+    ],
+)
+def test_request_timeout(
+    timeout: float | None,
+    header_value: str | None,
+    expected: float | None,
+) -> None:
+    assert request_timeout(timeout, header_value) == expected
+
+
+async def test_middleware_takes_timeout_from_header() -> None:
+    timeouts: list[tuple[int, int]] = []
+
+    async def app(scope: Any, receive: Any, send: Any) -> None:
+        timeouts.append(await _timeouts())
+        await send({"type": "http.response.start", "status": 200})
+
+    middleware = ASGIHTTPDBSessionMiddleware(
+        app, timeout=10, timeout_header="X-Request-Timeout-Ms"
+    )
+    scope = {"type": "http", "headers": [(b"x-request-timeout-ms", b"800")]}
+    await middleware(scope, AsyncMock(), AsyncMock())
+
+    assert 700 < timeouts[0][0] <= 800
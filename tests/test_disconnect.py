@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import text
+
+from context_async_sqlalchemy import (
+    ASGIHTTPDBSessionMiddleware,
+    db_session,
+    new_non_ctx_session,
+)
+from examples.database import connection
+from tests.helpers import checked_out_connections
+
+pytestmark = pytest.mark.usefixtures("close_connection")
+
+_SLEEP = "SELECT pg_sleep(5)"
+
+
+async def _running_sleeps() -> int:
+    async with new_non_ctx_session(connection) as session:
+        result = await session.execute(
+            text(
+                "SELECT count(*) FROM pg_stat_activity"
+                " WHERE state = 'active' AND query = :query"
+            ),
+            {"query": _SLEEP},
+        )
+        return int(result.scalar_one())
+
+
+def _disconnect_after(
+    delay: float,
+) -> Callable[[], Awaitable[dict[str, Any]]]:
+    async def receive() -> dict[str, Any]:
+        await asyncio.sleep(delay)
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def _sleeping_app(scope: Any, receive: Any, send: Any) -> None:
+    session = await db_session(connection)
+    await session.execute(text(_SLEEP))
+    await send({"type": "http.response.start", "status": 200})
+
+
+async def test_disconnect_cancels_statement() -> None:
+    middleware = ASGIHTTPDBSessionMiddleware(
+        _sleeping_app, cancel_on_disconnect=True
+    )
+    started = time.monotonic()
+
+    await middleware({"type": "http"}, _disconnect_after(0.2), AsyncMock())
+
+    assert time.monotonic() - started < 2
+    assert await _running_sleeps() == 0
+    assert await checked_out_connections(connection) == 0
+
+
+async def test_disconnect_after_response_is_ignored() -> None:
+    finished = False
+
+    async def app(scope: Any, receive: Any, send: Any) -> None:
+        nonlocal finished
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b""})
+        await asyncio.sleep(0.1)
+        finished = True
+
+    middleware = ASGIHTTPDBSessionMiddleware(app, cancel_on_disconnect=True)
+    await middleware({"type": "http"}, _disconnect_after(0), AsyncMock())
+
+    assert finished
+
+
+async def test_request_body_reaches_app() -> None:
+    received: list[dict[str, Any]] = []
+    body = {"type": "http.request", "body": b"data", "more_body": False}
+
+    async def app(scope: Any, receive: Any, send: Any) -> None:
+        received.append(await receive())
+        await send({"type": "http.response.start", "status": 200})
+
+    messages = [body]
+
+    async def receive() -> dict[str, Any]:
+        if messages:
+            return messages.pop()
+        return await _disconnect_after(10)()
+
+    middleware = ASGIHTTPDBSessionMiddleware(app, cancel_on_disconnect=True)
+    await middleware({"type": "http"}, receive, AsyncMock())
+
+    assert received == [body]
@@ -0,0 +1,123 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    SessionsFinalizationError,
+    commit_all_sessions,
+    init_db_session_ctx,
+    put_db_session_to_context,
+    reset_db_session_ctx,
+    rollback_all_sessions,
+)
+
+
+def _make_session_mock() -> MagicMock:
+    session = MagicMock()
+    session.commit = AsyncMock()
+    session.rollback = AsyncMock()
+    session.close = AsyncMock()
+    session.in_transaction.return_value = True
+    return session
+
+
+def _make_connection(commit_order: int = 0) -> DBConnect:
+    return DBConnect(
+        engine_creator=MagicMock(),
+        session_maker_creator=MagicMock(),
+        commit_order=commit_order,
+    )
+
+
+def _put_sessions(*connections: DBConnect) -> list[MagicMock]:
+    sessions = []
+    for connection in connections:
+        session = _make_session_mock()
+        put_db_session_to_context(connection, session)
+        sessions.append(session)
+    return sessions
+
+
+async def test_commit_order() -> None:
+    order: list[str] = []
+    token = init_db_session_ctx()
+    last, first = _put_sessions(_make_connection(1), _make_connection(0))
+    first.commit.side_effect = lambda: order.append("first")
+    last.commit.side_effect = lambda: order.append("last")
+
+    await commit_all_sessions()
+
+    assert order == ["first", "last"]
+    await reset_db_session_ctx(token)
+
+
+async def test_commit_concurrently() -> None:
+    started: list[None] = []
+    both_started = asyncio.Event()
+
+    async def commit() -> None:
+        # Each commit waits for the other one to start
+        started.append(None)
+        if len(started) == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), timeout=1)
+
+    token = init_db_session_ctx()
+    sessions = _put_sessions(_make_connection(), _make_connection())
+    for session in sessions:
+        session.commit.side_effect = commit
+
+    await commit_all_sessions(concurrently=True)
+
+    for session in sessions:
+        session.commit.assert_awaited_once()
+    await reset_db_session_ctx(token, concurrently=True)
+    for session in sessions:
+        session.close.assert_awaited_once()
+
+
+async def test_concurrent_commit_aggregates_errors() -> None:
+    token = init_db_session_ctx()
+    first, second, third = _put_sessions(
+        _make_connection(), _make_connection(), _make_connection()
+    )
+    later = _put_sessions(_make_connection(commit_order=1))[0]
+    first.commit.side_effect = ValueError("first")
+    second.commit.side_effect = RuntimeError("second")
+
+    with pytest.raises(SessionsFinalizationError) as exc_info:
+        await commit_all_sessions(concurrently=True)
+
+    assert [str(error) for error in exc_info.value.errors] == [
+        "first",
+        "second",
+    ]
+    third.commit.assert_awaited_once()
+    later.commit.assert_not_awaited()
+    await reset_db_session_ctx(token)
+
+
+async def test_concurrent_commit_single_error_is_reraised() -> None:
+    token = init_db_session_ctx()
+    first, second = _put_sessions(_make_connection(), _make_connection())
+    first.commit.side_effect = ValueError("first")
+
+    with pytest.raises(ValueError, match="first"):
+        await commit_all_sessions(concurrently=True)
+
+    second.commit.assert_awaited_once()
+    await reset_db_session_ctx(token)
+
+
+async def test_rollback_concurrently() -> None:
+    token = init_db_session_ctx()
+    sessions = _put_sessions(_make_connection(), _make_connection(1))
+    sessions[0].in_transaction.return_value = False
+
+    await rollback_all_sessions(concurrently=True)
+
+    sessions[0].rollback.assert_not_awaited()
+    sessions[1].rollback.assert_awaited_once()
+    await reset_db_session_ctx(token)
@@ -0,0 +1,121 @@
+import uuid
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pytest_asyncio
+from sqlalchemy import delete, select, update
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    IdentityCache,
+    commit_all_sessions,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, record_statements
+
+
+@pytest_asyncio.fixture
+async def cached_row(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, uuid.UUID, list[str]]]:
+    connection = make_connection(
+        identity_cache=IdentityCache({ExampleTable: 60})
+    )
+    session = await connection.create_session()
+    row = ExampleTable(text="identity")
+    session.add(row)
+    await session.commit()
+    statements = await record_statements(connection)
+
+    yield connection, row.id, statements
+
+    await session.execute(
+        delete(ExampleTable).where(ExampleTable.id == row.id)
+    )
+    await session.commit()
+    await session.close()
+
+
+async def _get(connection: DBConnect, id_: uuid.UUID, **kwargs: Any) -> Any:
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    row = await session.get(ExampleTable, id_, **kwargs)
+    assert await session.get(ExampleTable, id_) is row
+    await commit_all_sessions()
+    await reset_db_session_ctx(token)
+    return row
+
+
+async def test_get_is_cached(
+    cached_row: tuple[DBConnect, uuid.UUID, list[str]],
+) -> None:
+    connection, id_, statements = cached_row
+
+    first = await _get(connection, id_)
+    second = await _get(connection, id_)
+
+    assert first is not second
+    assert first.text == second.text == "identity"
+    assert len(statements) == 1
+
+
+async def test_missing_rows_are_cached(
+    cached_row: tuple[DBConnect, uuid.UUID, list[str]],
+) -> None:
+    connection, _, statements = cached_row
+    missing = uuid.uuid4()
+
+    assert await _get(connection, missing) is None
+    assert await _get(connection, missing) is None
+    assert len(statements) == 1
+
+
+async def test_commit_invalidates(
+    cached_row: tuple[DBConnect, uuid.UUID, list[str]],
+) -> None:
+    connection, id_, _ = cached_row
+    await _get(connection, id_)
+
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    await session.execute(
+        update(ExampleTable)
+        .where(ExampleTable.id == id_)
+        .values(text="changed")
+    )
+    await commit_all_sessions()
+    await reset_db_session_ctx(token)
+
+    assert (await _get(connection, id_)).text == "changed"
+
+
+async def test_other_lookups_are_not_cached(
+    cached_row: tuple[DBConnect, uuid.UUID, list[str]],
+) -> None:
+    connection, id_, statements = cached_row
+    await _get(connection, id_)
+
+    await _get(connection, id_, populate_existing=True)
+    await _get(connection, id_, with_for_update=True)
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    await session.execute(select(ExampleTable).where(ExampleTable.id == id_))
+    await reset_db_session_ctx(token)
+
+    assert len(statements) == 4
+
+
+async def test_models_without_ttl_are_not_cached(
+    cached_row: tuple[DBConnect, uuid.UUID, list[str]],
+) -> None:
+    connection, id_, statements = cached_row
+    assert connection.identity_cache is not None
+    connection.identity_cache.ttls.clear()
+
+    await _get(connection, id_)
+    await _get(connection, id_)
+
+    assert len(statements) == 2
@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select, text
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    IdleInTransactionError,
+    copy_rows,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from context_async_sqlalchemy.context import set_request_scope_ctx
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, checked_out_connections
+
+
+@pytest_asyncio.fixture
+async def watched_connection(make_connection: ConnectionFactory) -> DBConnect:
+    return make_connection(
+        idle_in_transaction_warning=0.05,
+        idle_in_transaction_timeout=0.2,
+    )
+
+
+async def test_idle_transaction_is_logged(
+    watched_connection: DBConnect,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    token = init_db_session_ctx()
+    set_request_scope_ctx({"method": "GET", "path": "/items"})
+    session = await db_session(watched_connection)
+    await session.execute(text("SELECT 1"))
+
+    with caplog.at_level(logging.WARNING, "context_async_sqlalchemy"):
+        await asyncio.sleep(0.1)
+
+    assert "idle" in caplog.text
+    assert "GET /items" in caplog.text
+    assert session.in_transaction()
+    await session.execute(text("SELECT 1"))
+    await reset_db_session_ctx(token)
+
+
+async def test_running_statement_is_not_idle(
+    watched_connection: DBConnect,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(watched_connection)
+
+    with caplog.at_level(logging.WARNING, "context_async_sqlalchemy"):
+        await session.execute(text("SELECT pg_sleep(0.1)"))
+        await session.commit()
+        await asyncio.sleep(0.1)
+
+    assert not caplog.text
+    await reset_db_session_ctx(token)
+
+
+async def test_idle_transaction_is_rolled_back(
+    watched_connection: DBConnect,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(watched_connection)
+    await session.execute(text("SELECT 1"))
+
+    await asyncio.sleep(0.3)
+
+    assert not session.in_transaction()
+    assert await checked_out_connections(watched_connection) == 0
+    with pytest.raises(IdleInTransactionError):
+        await session.execute(text("SELECT 1"))
+    await reset_db_session_ctx(token)
+
+
+async def test_slow_commit_is_not_rolled_back(
+    watched_connection: DBConnect,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(watched_connection)
+    # A deferred trigger makes COMMIT take longer than the timeout
+    await session.execute(
+        text(
+            "CREATE OR REPLACE FUNCTION pg_temp.slow_commit() RETURNS trigger"
+            " LANGUAGE plpgsql AS"
+            " $$ BEGIN PERFORM pg_sleep(0.4); RETURN NULL; END $$"
+        )
+    )
+    await session.execute(
+        text("CREATE TEMP TABLE slow_commit (id int) ON COMMIT DROP")
+    )
+    await session.execute(
+        text(
+            "CREATE CONSTRAINT TRIGGER slow_commit AFTER INSERT"
+            " ON slow_commit DEFERRABLE INITIALLY DEFERRED"
+            " FOR EACH ROW EXECUTE FUNCTION pg_temp.slow_commit()"
+        )
+    )
+    await session.execute(text("INSERT INTO slow_commit VALUES (1)"))
+
+    await session.commit()
+
+    await session.execute(text("SELECT 1"))
+    await reset_db_session_ctx(token)
+
+
+async def test_copy_is_not_idle(watched_connection: DBConnect) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(watched_connection)
+
+    async def slow_rows() -> AsyncIterator[tuple[str]]:
+        # The COPY takes longer than the timeout
+        for _ in range(5):
+            await asyncio.sleep(0.1)
+            yield ("idle copy",)
+
+    count = await copy_rows(
+        session, ExampleTable, slow_rows(), columns=["text"]
+    )
+
+    assert count == 5
+    assert session.in_transaction()
+    copied = await session.scalar(
+        select(func.count()).where(ExampleTable.text == "idle copy")
+    )
+    assert copied == 5
+    await session.rollback()
+    await reset_db_session_ctx(token)
+
+
+async def test_failed_rollback_invalidates_connection(
+    watched_connection: DBConnect,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(watched_connection)
+    connection = await session.connection()
+    await connection.execute(text("SELECT 1"))
+    raw_connection = await connection.get_raw_connection()
+    driver_connection: Any = raw_connection.driver_connection
+
+    with caplog.at_level(logging.WARNING, "context_async_sqlalchemy"):
+        # The statement is out of sight of the watchdog, so the rollback
+        # is attempted while the connection is busy and fails
+        with contextlib.suppress(Exception):
+            await driver_connection.execute("SELECT pg_sleep(0.4)")
+        await asyncio.sleep(0.1)
+    await reset_db_session_ctx(token)
+
+    assert "invalidated" in caplog.text
+    token = init_db_session_ctx()
+    session = await db_session(watched_connection)
+    assert await session.scalar(text("SELECT 1")) == 1
+    await reset_db_session_ctx(token)
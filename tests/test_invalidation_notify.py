@@ -0,0 +1,142 @@
+import asyncio
+from typing import Any
+
+import pytest_asyncio
+from sqlalchemy import delete, insert, text
+
+from context_async_sqlalchemy import (
+    ANY_TABLE,
+    READ_STATEMENT,
+    DBConnect,
+    InvalidationListener,
+    ResultCache,
+)
+from context_async_sqlalchemy.read_only import (
+    create_read_only_session,
+    read_only_execution_options,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory
+
+CHANNEL = "test_invalidation"
+
+
+@pytest_asyncio.fixture
+async def processes(
+    make_connection: ConnectionFactory,
+) -> tuple[DBConnect, DBConnect]:
+    """Connections of two processes"""
+    writer = make_connection(invalidation_channel=CHANNEL)
+    reader = make_connection(
+        invalidation_channel=CHANNEL, result_cache=ResultCache()
+    )
+    await writer.connect("127.0.0.1")
+    await reader.connect("127.0.0.1")
+    for connection in (writer, reader):
+        listener = connection.invalidation_listener
+        assert listener is not None
+        await asyncio.wait_for(listener.listening.wait(), 5)
+    return writer, reader
+
+
+async def _received(
+    listener: InvalidationListener,
+) -> asyncio.Queue[set[str]]:
+    received: asyncio.Queue[set[str]] = asyncio.Queue()
+    listener.subscribe(received.put_nowait)
+    return received
+
+
+async def test_commit_notifies_other_processes(
+    processes: tuple[DBConnect, DBConnect],
+) -> None:
+    writer, reader = processes
+    assert reader.invalidation_listener is not None
+    assert reader.result_cache is not None
+    result: Any = object()
+    reader.result_cache.put("key", result, {"example"})
+    received = await _received(reader.invalidation_listener)
+
+    session = await writer.create_session()
+    session.add(ExampleTable(text="notify"))
+    await session.commit()
+    await session.execute(
+        delete(ExampleTable).where(ExampleTable.text == "notify")
+    )
+    await session.commit()
+    await session.close()
+
+    assert await asyncio.wait_for(received.get(), 5) == {"example"}
+    assert len(reader.result_cache) == 0
+
+
+async def test_rollback_and_reads_dont_notify(
+    processes: tuple[DBConnect, DBConnect],
+) -> None:
+    writer, reader = processes
+    assert reader.invalidation_listener is not None
+    received = await _received(reader.invalidation_listener)
+
+    session = await writer.create_session()
+    await session.execute(insert(ExampleTable).values(text="notify"))
+    await session.rollback()
+    await session.execute(text("SELECT 1").columns())
+    await session.commit()
+    await session.execute(text("SELECT 2"))
+    await session.commit()
+    await session.close()
+
+    assert await asyncio.wait_for(received.get(), 5) == {ANY_TABLE}
+    assert received.empty()
+
+
+async def test_textual_reads_dont_notify(
+    processes: tuple[DBConnect, DBConnect],
+) -> None:
+    writer, reader = processes
+    assert reader.invalidation_listener is not None
+    received = await _received(reader.invalidation_listener)
+
+    session = await writer.create_session()
+    await session.execute(
+        text("SELECT 1"), execution_options={READ_STATEMENT: True}
+    )
+    await session.commit()
+    await session.close()
+    read_only = await create_read_only_session(
+        writer, read_only_execution_options()
+    )
+    await read_only.execute(text("SELECT 2"))
+    await read_only.commit()
+    await read_only.close()
+    marker = await writer.create_session()
+    await marker.execute(text("SELECT 3"))
+    await marker.commit()
+    await marker.close()
+
+    # Only the unmarked statement of the last session notifies
+    assert await asyncio.wait_for(received.get(), 5) == {ANY_TABLE}
+    assert received.empty()
+
+
+async def test_reconnect_invalidates_everything(
+    processes: tuple[DBConnect, DBConnect],
+) -> None:
+    _, reader = processes
+    listener = reader.invalidation_listener
+    assert listener is not None
+    listener.reconnect_delay = 0
+    received = await _received(listener)
+
+    session = await reader.create_session()
+    await session.execute(
+        text(
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+            "WHERE query LIKE :query"
+        ),
+        {"query": f"LISTEN%{CHANNEL}%"},
+    )
+    await session.close()
+
+    assert await asyncio.wait_for(received.get(), 5) == {ANY_TABLE}
+    await asyncio.wait_for(listener.listening.wait(), 5)
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    ContextFinalizedError,
+    DBConnect,
+    db_session,
+    init_db_session_ctx,
+    late_sessions_count,
+    reset_db_session_ctx,
+)
+from tests.helpers import ConnectionFactory, checked_out_connections
+
+
+@pytest_asyncio.fixture
+async def closing_connection(make_connection: ConnectionFactory) -> DBConnect:
+    return make_connection(late_sessions="close")
+
+
+async def _request_with_background_task(
+    background: Callable[[], Awaitable[Any]],
+) -> asyncio.Task[Any]:
+    token = init_db_session_ctx()
+    started = asyncio.Event()
+
+    async def task() -> Any:
+        started.set()
+        await asyncio.sleep(0.01)
+        return await background()
+
+    background_task = asyncio.create_task(task())
+    await started.wait()
+    await reset_db_session_ctx(token)
+    return background_task
+
+
+async def test_late_session_is_closed_with_task(
+    closing_connection: DBConnect,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    late = late_sessions_count()
+
+    async def background() -> AsyncSession:
+        session = await db_session(closing_connection)
+        assert await db_session(closing_connection) is session
+        await session.execute(text("SELECT 1"))
+        return session
+
+    with caplog.at_level(logging.WARNING, "context_async_sqlalchemy"):
+        task = await _request_with_background_task(background)
+        session = await task
+        await asyncio.sleep(0.01)
+
+    assert not session.in_transaction()
+    assert await checked_out_connections(closing_connection) == 0
+    assert late_sessions_count() == late + 1
+    assert __file__ in caplog.text
+
+
+async def test_late_session_is_rejected(
+    make_connection: ConnectionFactory,
+) -> None:
+    connection = make_connection(late_sessions="raise")
+
+    async def background() -> None:
+        await db_session(connection)
+
+    task = await _request_with_background_task(background)
+
+    with pytest.raises(ContextFinalizedError, match=__file__):
+        await task
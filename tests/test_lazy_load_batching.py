@@ -0,0 +1,126 @@
+import logging
+from collections.abc import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import ForeignKey, select
+from sqlalchemy.ext.asyncio import AsyncAttrs
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    batched_lazy_loads,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from tests.helpers import ConnectionFactory, engine_of, record_statements
+
+
+class Base(AsyncAttrs, DeclarativeBase):
+    pass
+
+
+class Author(Base):
+    __tablename__ = "lazy_author"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    mentor_id: Mapped[int | None] = mapped_column(ForeignKey("lazy_author.id"))
+    books: Mapped[list["Book"]] = relationship(
+        back_populates="author", order_by="Book.id"
+    )
+    mentor: Mapped["Author | None"] = relationship(remote_side=[id])
+
+
+class Book(Base):
+    __tablename__ = "lazy_book"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("lazy_author.id"))
+    author: Mapped[Author] = relationship(back_populates="books")
+
+
+@pytest_asyncio.fixture
+async def batching_connection(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, list[str]]]:
+    connection = make_connection(batch_lazy_loads=True)
+    engine = await engine_of(connection)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = await connection.create_session()
+    session.add_all(
+        Author(id=i, mentor_id=None if i == 0 else 0) for i in range(5)
+    )
+    await session.flush()
+    session.add_all(Book(id=i, author_id=i // 2) for i in range(7))
+    await session.commit()
+    await session.close()
+
+    statements = await record_statements(connection)
+    yield connection, statements
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+
+async def test_collections_are_batched(
+    batching_connection: tuple[DBConnect, list[str]],
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    connection, statements = batching_connection
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    authors = (await session.execute(select(Author))).scalars().all()
+    statements.clear()
+
+    with caplog.at_level(logging.WARNING, "context_async_sqlalchemy"):
+        books = [
+            [book.id for book in await author.awaitable_attrs.books]
+            for author in authors
+        ]
+
+    assert books == [[0, 1], [2, 3], [4, 5], [6], []]
+    assert len(statements) == 2
+    assert __file__ in caplog.text
+    assert any(
+        __file__ in name and name.endswith("Author.books")
+        for name in batched_lazy_loads()
+    )
+    await reset_db_session_ctx(token)
+
+
+async def test_many_to_one_is_batched(
+    batching_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = batching_connection
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    books = (await session.execute(select(Book))).scalars().all()
+    statements.clear()
+
+    authors = [(await book.awaitable_attrs.author).id for book in books]
+
+    assert authors == [0, 0, 1, 1, 2, 2, 3]
+    assert len(statements) == 2
+    await reset_db_session_ctx(token)
+
+
+async def test_self_referential_relationship(
+    batching_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = batching_connection
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    authors = (
+        (await session.execute(select(Author).where(Author.id > 0)))
+        .scalars()
+        .all()
+    )
+    statements.clear()
+
+    mentors = [(await author.awaitable_attrs.mentor) for author in authors]
+
+    assert {mentor.id for mentor in mentors if mentor is not None} == {0}
+    assert len(statements) == 2
+    await reset_db_session_ctx(token)
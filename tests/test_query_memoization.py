@@ -0,0 +1,139 @@
+from collections.abc import AsyncGenerator
+
+import pytest_asyncio
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, record_statements
+
+
+@pytest_asyncio.fixture
+async def memo_session(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[AsyncSession, list[str]]]:
+    connection = make_connection(memoize_queries=True)
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    statements = await record_statements(connection)
+
+    yield session, statements
+
+    await session.rollback()
+    await reset_db_session_ctx(token)
+
+
+async def test_repeated_query_is_memoized(
+    memo_session: tuple[AsyncSession, list[str]],
+) -> None:
+    session, statements = memo_session
+    query = select(ExampleTable).where(ExampleTable.text == "memo")
+
+    first = (await session.execute(query)).scalars().all()
+    second = (await session.execute(query)).scalars().all()
+    other = await session.execute(query.where(ExampleTable.text != "x"))
+
+    assert first == second
+    assert len(statements) == 2
+    assert other.all() == []
+
+
+async def test_parameters_are_part_of_the_key(
+    memo_session: tuple[AsyncSession, list[str]],
+) -> None:
+    session, statements = memo_session
+    query = select(ExampleTable.text).where(ExampleTable.text == "memo")
+
+    await session.execute(query)
+    await session.execute(
+        select(ExampleTable.text).where(ExampleTable.text == "other")
+    )
+
+    assert len(statements) == 2
+
+
+async def test_writes_invalidate_results(
+    memo_session: tuple[AsyncSession, list[str]],
+) -> None:
+    session, _ = memo_session
+    query = select(ExampleTable.text).where(ExampleTable.text == "memo")
+
+    assert (await session.execute(query)).all() == []
+    await session.execute(insert(ExampleTable).values(text="memo"))
+    assert (await session.execute(query)).all() == [("memo",)]
+
+    session.add(ExampleTable(text="memo"))
+    assert (await session.execute(query)).all() == [("memo",), ("memo",)]
+
+    await session.execute(query)
+    await session.rollback()
+    assert (await session.execute(query)).all() == []
+
+
+async def test_connection_writes_invalidate_results(
+    memo_session: tuple[AsyncSession, list[str]],
+) -> None:
+    session, _ = memo_session
+    query = select(ExampleTable.text).where(ExampleTable.text.like("memo%"))
+    await session.execute(insert(ExampleTable).values(text="memo"))
+    assert (await session.execute(query)).all() == [("memo",)]
+
+    connection = await session.connection()
+    await connection.execute(
+        update(ExampleTable)
+        .where(ExampleTable.text == "memo")
+        .values(text="memo updated")
+    )
+    assert (await session.execute(query)).all() == [("memo updated",)]
+
+    await connection.exec_driver_sql(
+        "UPDATE example SET text = 'memo driver' WHERE text LIKE 'memo%'"
+    )
+    assert (await session.execute(query)).all() == [("memo driver",)]
+
+
+async def test_textual_statement_invalidates_everything(
+    memo_session: tuple[AsyncSession, list[str]],
+) -> None:
+    session, statements = memo_session
+    query = select(ExampleTable.text).where(ExampleTable.text == "memo")
+
+    await session.execute(query)
+    await session.execute(text("SELECT 1"))
+    await session.execute(query)
+
+    assert len(statements) == 3
+
+
+async def test_locking_query_is_not_memoized(
+    memo_session: tuple[AsyncSession, list[str]],
+) -> None:
+    session, statements = memo_session
+    query = (
+        select(ExampleTable)
+        .where(ExampleTable.text == "memo")
+        .with_for_update()
+    )
+
+    await session.execute(query)
+    await session.execute(query)
+
+    assert len([s for s in statements if "FOR UPDATE" in s]) == 2
+
+
+async def test_commit_forgets_results(
+    memo_session: tuple[AsyncSession, list[str]],
+) -> None:
+    session, statements = memo_session
+    query = select(ExampleTable).where(ExampleTable.text == "memo")
+
+    await session.execute(query)
+    await session.commit()
+    await session.execute(query)
+
+    assert len([s for s in statements if "example.text" in s]) == 2
@@ -0,0 +1,105 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pytest_asyncio
+from sqlalchemy import delete, insert, inspect, select, text
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, record_statements
+
+SLOW_QUERY = select(ExampleTable).where(
+    ExampleTable.text == "coalesced", text("pg_sleep(0.1) IS NOT NULL")
+)
+
+
+@pytest_asyncio.fixture
+async def coalescing_connection(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, list[str]]]:
+    connection = make_connection(coalesce_reads=True)
+    await connection.connect("127.0.0.1")
+    statements = await record_statements(connection)
+    yield connection, statements
+
+
+async def _request(connection: DBConnect, write: bool = False) -> list[Any]:
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    if write:
+        await session.execute(insert(ExampleTable).values(text="coalesced"))
+    rows = (await session.execute(SLOW_QUERY)).scalars().all()
+    await session.rollback()
+    await reset_db_session_ctx(token)
+    return list(rows)
+
+
+async def test_concurrent_queries_are_coalesced(
+    coalescing_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = coalescing_connection
+
+    results = await asyncio.gather(*(_request(connection) for _ in range(5)))
+
+    assert results == [[]] * 5
+    assert len(statements) == 1
+    assert connection.read_coalescer is not None
+    assert connection.read_coalescer.coalesced == 4
+    assert not connection.read_coalescer.flights
+
+
+async def test_writer_is_not_coalesced(
+    coalescing_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = coalescing_connection
+    writer = asyncio.ensure_future(_request(connection, write=True))
+    await asyncio.sleep(0.01)
+
+    # The writer sees its own row, so the readers don't wait for it
+    results = await asyncio.gather(
+        writer, _request(connection), _request(connection)
+    )
+
+    assert len(results[0]) == 1
+    assert results[1] == results[2] == []
+    assert len(statements) == 3
+
+
+async def test_objects_are_copied(
+    coalescing_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = coalescing_connection
+    session = await connection.create_session()
+    await session.execute(insert(ExampleTable).values(text="coalesced"))
+    await session.commit()
+
+    try:
+        first, second = await asyncio.gather(
+            _request(connection), _request(connection)
+        )
+    finally:
+        await session.execute(
+            delete(ExampleTable).where(ExampleTable.text == "coalesced")
+        )
+        await session.commit()
+        await session.close()
+
+    assert first[0] is not second[0]
+    assert inspect(first[0]).identity == inspect(second[0]).identity
+
+
+async def test_sequential_queries_are_not_coalesced(
+    coalescing_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = coalescing_connection
+
+    await _request(connection)
+    await _request(connection)
+
+    assert len(statements) == 2
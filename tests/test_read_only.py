@@ -0,0 +1,168 @@
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.exc import DBAPIError, InvalidRequestError
+
+from context_async_sqlalchemy import (
+    READ_STATEMENT,
+    DBConnect,
+    commit_all_sessions,
+    db_session,
+    init_db_session_ctx,
+    new_non_ctx_atomic_session,
+    new_non_ctx_read_only_session,
+    reset_db_session_ctx,
+    set_autocommit_read_ctx,
+    set_read_only_ctx,
+)
+from context_async_sqlalchemy.writes import is_read_only_session
+from examples.database import connection
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, checked_out_connections
+
+pytestmark = pytest.mark.usefixtures("close_connection")
+
+
+@pytest_asyncio.fixture
+async def replica_connection(
+    make_connection: ConnectionFactory,
+) -> DBConnect:
+    return make_connection(read_only=True)
+
+
+async def _transaction_setting(name: str) -> str:
+    session = await db_session(connection)
+    result = await session.execute(text(f"SHOW {name}"))
+    return str(result.scalar_one())
+
+
+async def test_read_only_ctx() -> None:
+    token = init_db_session_ctx()
+    set_read_only_ctx(deferrable=True, isolation_level="SERIALIZABLE")
+
+    assert await _transaction_setting("transaction_read_only") == "on"
+    assert await _transaction_setting("transaction_deferrable") == "on"
+    assert await _transaction_setting("transaction_isolation") == (
+        "serializable"
+    )
+    assert is_read_only_session(await db_session(connection))
+
+    await reset_db_session_ctx(token)
+
+
+async def test_read_only_ctx_rejects_writes() -> None:
+    token = init_db_session_ctx()
+    set_read_only_ctx()
+    session = await db_session(connection)
+
+    with pytest.raises(DBAPIError, match="read-only transaction"):
+        await session.execute(insert(ExampleTable).values(text="read only"))
+
+    await reset_db_session_ctx(token)
+
+
+async def test_read_write_session_by_default() -> None:
+    token = init_db_session_ctx()
+
+    assert await _transaction_setting("transaction_read_only") == "off"
+    assert not is_read_only_session(await db_session(connection))
+
+    await reset_db_session_ctx(token)
+
+
+async def test_read_only_connection(replica_connection: DBConnect) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(replica_connection)
+
+    result = await session.execute(text("SHOW transaction_read_only"))
+
+    assert result.scalar_one() == "on"
+    await reset_db_session_ctx(token)
+
+
+async def test_read_only_session_is_not_committed() -> None:
+    token = init_db_session_ctx()
+    set_read_only_ctx()
+    session = await db_session(connection)
+    await session.execute(text("SELECT 1"))
+    before_commit = AsyncMock()
+
+    await commit_all_sessions(before_commit=before_commit)
+
+    before_commit.assert_not_awaited()
+    assert session.in_transaction()
+    await reset_db_session_ctx(token)
+    assert not session.in_transaction()
+
+
+async def test_non_ctx_read_only_session() -> None:
+    async with new_non_ctx_read_only_session(connection) as session:
+        result = await session.execute(text("SHOW transaction_read_only"))
+        assert result.scalar_one() == "on"
+
+
+@pytest_asyncio.fixture
+async def autocommit_read_connection(
+    make_connection: ConnectionFactory,
+) -> DBConnect:
+    return make_connection(autocommit_read=True)
+
+
+async def test_autocommit_read_releases_connection(
+    autocommit_read_connection: DBConnect,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(autocommit_read_connection)
+
+    result = await session.execute(
+        text("SELECT generate_series(1, 1000)"),
+        execution_options={READ_STATEMENT: True},
+    )
+
+    assert await checked_out_connections(autocommit_read_connection) == 0
+    assert not session.in_transaction()
+    assert len(result.all()) == 1000
+    await reset_db_session_ctx(token)
+
+
+async def test_autocommit_read_keeps_loaded_objects() -> None:
+    async with new_non_ctx_atomic_session(connection) as session:
+        await session.execute(insert(ExampleTable).values(text="autocommit"))
+    token = init_db_session_ctx()
+    set_autocommit_read_ctx()
+    session = await db_session(connection)
+
+    result = await session.scalars(
+        select(ExampleTable).where(ExampleTable.text == "autocommit")
+    )
+
+    assert await checked_out_connections(connection) == 0
+    instance = result.one()
+    assert "text" in instance.__dict__
+    await reset_db_session_ctx(token)
+    async with new_non_ctx_atomic_session(connection) as session:
+        await session.execute(
+            delete(ExampleTable).where(ExampleTable.text == "autocommit")
+        )
+
+
+async def test_autocommit_read_rejects_writes(
+    autocommit_read_connection: DBConnect,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(autocommit_read_connection)
+
+    with pytest.raises(InvalidRequestError):
+        await session.execute(insert(ExampleTable).values(text="read"))
+
+    with pytest.raises(InvalidRequestError):
+        await session.execute(text("DELETE FROM example WHERE false"))
+
+    session.add(ExampleTable(text="read"))
+    with pytest.raises(InvalidRequestError):
+        await session.flush()
+
+    await session.rollback()
+    await reset_db_session_ctx(token)
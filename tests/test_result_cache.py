@@ -0,0 +1,196 @@
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pytest_asyncio
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    CACHE_RESULT,
+    READ_STATEMENT,
+    DBConnect,
+    ResultCache,
+    commit_all_sessions,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+    set_read_only_ctx,
+)
+from examples.fastapi_example.read_own_writes import (
+    get_current_lsn_if_there_writes,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory, record_statements
+
+QUERY = (
+    select(ExampleTable)
+    .where(ExampleTable.text == "cached")
+    .execution_options(**{CACHE_RESULT: True})
+)
+
+
+@pytest_asyncio.fixture
+async def cached_connection(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, list[str]]]:
+    connection = make_connection(result_cache=ResultCache(max_size=2, ttl=60))
+    session = await connection.create_session()
+    statements = await record_statements(connection)
+
+    yield connection, statements
+
+    await session.execute(
+        delete(ExampleTable).where(ExampleTable.text == "cached")
+    )
+    await session.commit()
+    await session.close()
+
+
+async def _request(connection: DBConnect, write: bool = False) -> list[Any]:
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    if write:
+        session.add(ExampleTable(text="cached"))
+    rows = (await session.execute(QUERY)).scalars().all()
+    await commit_all_sessions()
+    await reset_db_session_ctx(token)
+    return list(rows)
+
+
+async def test_results_are_shared_between_requests(
+    cached_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = cached_connection
+    assert connection.result_cache is not None
+
+    first = await _request(connection)
+    second = await _request(connection)
+
+    assert first == second == []
+    assert len(statements) == 1
+    assert connection.result_cache.hits == 1
+
+
+async def test_commit_invalidates_written_tables(
+    cached_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = cached_connection
+
+    assert await _request(connection) == []
+    written = await _request(connection, write=True)
+    cached = await _request(connection)
+
+    assert len(written) == len(cached) == 1
+    assert cached[0] is not written[0]
+    assert cached[0].id == written[0].id
+
+
+async def test_lsn_callback_of_read_request_keeps_the_cache(
+    cached_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = cached_connection
+    assert connection.result_cache is not None
+    await _request(connection)
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    # The cached result doesn't begin the transaction
+    await session.execute(select(ExampleTable.id).limit(1))
+
+    async def before_commit(session: AsyncSession) -> None:
+        await get_current_lsn_if_there_writes(session)
+
+    await commit_all_sessions(before_commit=before_commit)
+
+    assert len(connection.result_cache) == 1
+    await reset_db_session_ctx(token)
+
+
+async def test_cached_objects_are_copied(
+    cached_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = cached_connection
+    await _request(connection, write=True)
+    first = await _request(connection)
+
+    first[0].text = "changed"
+    second = await _request(connection)
+
+    assert second[0].text == "cached"
+    assert len(statements) == 3
+
+
+async def test_session_writes_bypass_the_cache(
+    cached_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = cached_connection
+    await _request(connection)
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+
+    await session.execute(insert(ExampleTable).values(text="cached"))
+    rows = (await session.execute(QUERY)).scalars().all()
+
+    assert len(rows) == 1
+    await session.rollback()
+    assert (await session.execute(QUERY)).scalars().all() == []
+    await reset_db_session_ctx(token)
+
+
+def test_least_recently_used_are_evicted() -> None:
+    cache = ResultCache(max_size=2)
+    results: list[Any] = [object(), object(), object()]
+
+    cache.put("a", results[0], {"a"})
+    cache.put("b", results[1], {"b"})
+    assert cache.get("a") is results[0]
+    cache.put("c", results[2], {"c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is results[0]
+    cache.invalidate({"a"})
+    assert len(cache) == 1
+
+
+def test_expired_results_are_dropped() -> None:
+    cache = ResultCache()
+    result: Any = object()
+
+    cache.put("a", result, {"a"}, ttl=0)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+async def test_textual_reads_dont_invalidate(
+    cached_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = cached_connection
+    await _request(connection)
+
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    await session.execute(
+        text("SELECT 1"), execution_options={READ_STATEMENT: True}
+    )
+    await session.commit()
+    await reset_db_session_ctx(token)
+    await _request(connection)
+
+    assert len([s for s in statements if "example.text" in s]) == 1
+
+
+async def test_read_only_sessions_dont_invalidate(
+    cached_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = cached_connection
+    await _request(connection)
+
+    token = init_db_session_ctx()
+    set_read_only_ctx()
+    session = await db_session(connection)
+    await session.execute(text("SELECT 1"))
+    await session.commit()
+    await reset_db_session_ctx(token)
+    await _request(connection)
+
+    assert len([s for s in statements if "example.text" in s]) == 1
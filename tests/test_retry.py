@@ -0,0 +1,122 @@
+import random
+
+import pytest
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.exc import DBAPIError, InvalidRequestError
+
+from context_async_sqlalchemy import (
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+    retry_atomic_db_session,
+    retry_counters,
+    retry_in_new_ctx,
+)
+from examples.database import connection
+from examples.models import ExampleTable
+
+pytestmark = pytest.mark.usefixtures("close_connection")
+
+_RAISE_SQLSTATE = "DO $$ BEGIN RAISE SQLSTATE '{}'; END $$"
+
+
+async def _insert_and_fail(attempts: list[int], sqlstate: str) -> int:
+    attempts.append(len(attempts))
+    session = await db_session(connection)
+    await session.execute(insert(ExampleTable).values(text="retry"))
+    if len(attempts) == 1:
+        await session.execute(text(_RAISE_SQLSTATE.format(sqlstate)))
+    return len(attempts)
+
+
+async def _count_and_clean() -> int:
+    session = await db_session(connection)
+    count = await session.scalar(
+        select(func.count()).where(ExampleTable.text == "retry")
+    )
+    await session.execute(
+        delete(ExampleTable).where(ExampleTable.text == "retry")
+    )
+    await session.commit()
+    return int(count or 0)
+
+
+async def test_retry_atomic_db_session() -> None:
+    token = init_db_session_ctx()
+
+    @retry_atomic_db_session(connection, base_delay=0)
+    async def insert_row(attempts: list[int]) -> int:
+        return await _insert_and_fail(attempts, "40001")
+
+    assert await insert_row([]) == 2
+    assert await _count_and_clean() == 1
+    assert (
+        retry_counters()[
+            "tests.test_retry.test_retry_atomic_db_session.<locals>.insert_row"
+        ]
+        == 1
+    )
+
+    await reset_db_session_ctx(token)
+
+
+async def test_retry_in_new_ctx() -> None:
+    @retry_in_new_ctx(base_delay=0)
+    async def insert_row(attempts: list[int]) -> int:
+        return await _insert_and_fail(attempts, "40P01")
+
+    assert await insert_row([]) == 2
+
+    token = init_db_session_ctx()
+    assert await _count_and_clean() == 1
+    await reset_db_session_ctx(token)
+
+
+async def test_other_errors_are_not_retried() -> None:
+    attempts: list[int] = []
+
+    @retry_in_new_ctx(base_delay=0)
+    async def insert_row() -> int:
+        return await _insert_and_fail(attempts, "23505")
+
+    with pytest.raises(DBAPIError):
+        await insert_row()
+    assert len(attempts) == 1
+
+
+async def test_attempts_are_bounded() -> None:
+    attempts: list[int] = []
+
+    @retry_in_new_ctx(attempts=3, base_delay=0)
+    async def always_fail() -> None:
+        attempts.append(len(attempts))
+        session = await db_session(connection)
+        await session.execute(text(_RAISE_SQLSTATE.format("40001")))
+
+    with pytest.raises(DBAPIError):
+        await always_fail()
+    assert len(attempts) == 3
+
+
+async def test_deadline_stops_retries(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    attempts: list[int] = []
+    # The first retry ends by 0.3 seconds, the second one would end after
+    # the deadline
+    monkeypatch.setattr(random, "uniform", lambda *_: 0.3)
+
+    @retry_in_new_ctx(deadline=0.5)
+    async def always_fail() -> None:
+        attempts.append(len(attempts))
+        session = await db_session(connection)
+        await session.execute(text(_RAISE_SQLSTATE.format("40001")))
+
+    with pytest.raises(DBAPIError):
+        await always_fail()
+    assert len(attempts) == 2
+
+
+def test_append_is_not_retried() -> None:
+    with pytest.raises(InvalidRequestError):
+        retry_atomic_db_session(connection, current_transaction="append")
@@ -0,0 +1,153 @@
+import asyncio
+from typing import cast
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    close_db_session,
+    commit_all_sessions,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+)
+from context_async_sqlalchemy.context import sessions_stream
+from tests.helpers import ConnectionFactory
+
+
+def _make_session_mock() -> MagicMock:
+    session = MagicMock()
+    session.commit = AsyncMock()
+    session.rollback = AsyncMock()
+    session.close = AsyncMock()
+    session.in_transaction.return_value = True
+    return session
+
+
+def _make_connection(session_per_task: bool) -> DBConnect:
+    maker = MagicMock(side_effect=_make_session_mock)
+    return DBConnect(
+        engine_creator=MagicMock(),
+        session_maker_creator=MagicMock(return_value=maker),
+        host="some_host",
+        session_per_task=session_per_task,
+    )
+
+
+@pytest_asyncio.fixture
+async def per_task_connection(
+    make_connection: ConnectionFactory,
+) -> DBConnect:
+    return make_connection(session_per_task=True)
+
+
+async def test_same_task_gets_same_session() -> None:
+    connection = _make_connection(session_per_task=True)
+    token = init_db_session_ctx()
+
+    session = await db_session(connection)
+    assert await db_session(connection) is session
+
+    await reset_db_session_ctx(token)
+
+
+async def test_child_tasks_get_own_sessions() -> None:
+    connection = _make_connection(session_per_task=True)
+    token = init_db_session_ctx()
+    main_session = await db_session(connection)
+
+    async def child() -> AsyncSession:
+        session = await db_session(connection)
+        assert await db_session(connection) is session
+        return session
+
+    first, second = await asyncio.gather(child(), child())
+
+    assert len({id(main_session), id(first), id(second)}) == 3
+    assert set(map(id, sessions_stream())) == {
+        id(main_session),
+        id(first),
+        id(second),
+    }
+
+    await commit_all_sessions()
+    for session in (main_session, first, second):
+        cast("AsyncMock", session.commit).assert_awaited_once()
+
+    await reset_db_session_ctx(token)
+
+
+async def test_first_task_becomes_owner() -> None:
+    connection = _make_connection(session_per_task=True)
+    token = init_db_session_ctx()
+
+    async def child() -> AsyncSession:
+        return await db_session(connection)
+
+    first, second = await asyncio.gather(child(), child())
+
+    assert first is not second
+    await reset_db_session_ctx(token)
+
+
+async def test_new_task_does_not_get_finished_task_session() -> None:
+    connection = _make_connection(session_per_task=True)
+    token = init_db_session_ctx()
+    await db_session(connection)
+
+    async def child() -> AsyncSession:
+        return await db_session(connection)
+
+    sessions = [await asyncio.create_task(child()) for _ in range(20)]
+
+    assert len(set(map(id, sessions))) == len(sessions)
+    await reset_db_session_ctx(token)
+
+
+async def test_child_task_closes_only_own_session() -> None:
+    connection = _make_connection(session_per_task=True)
+    token = init_db_session_ctx()
+    main_session = await db_session(connection)
+
+    async def child() -> None:
+        await db_session(connection)
+        await close_db_session(connection)
+
+    await asyncio.create_task(child())
+
+    assert list(sessions_stream()) == [main_session]
+    await reset_db_session_ctx(token)
+
+
+async def test_shared_session_without_option() -> None:
+    connection = _make_connection(session_per_task=False)
+    token = init_db_session_ctx()
+    main_session = await db_session(connection)
+
+    async def child() -> AsyncSession:
+        return await db_session(connection)
+
+    sessions = await asyncio.gather(child(), child())
+
+    assert list(sessions) == [main_session, main_session]
+    await reset_db_session_ctx(token)
+
+
+async def test_child_tasks_use_own_connections(
+    per_task_connection: DBConnect,
+) -> None:
+    token = init_db_session_ctx()
+
+    async def backend_pid() -> int:
+        session = await db_session(per_task_connection)
+        result = await session.execute(text("SELECT pg_backend_pid()"))
+        return int(result.scalar_one())
+
+    main_pid = await backend_pid()
+    pids = await asyncio.gather(backend_pid(), backend_pid())
+
+    assert len({main_pid, *pids}) == 3
+    await reset_db_session_ctx(token)
@@ -0,0 +1,146 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    commit_all_sessions,
+    db_session,
+    finalize_db_session_ctx,
+    init_db_session_ctx,
+    leaked_sessions_count,
+    put_db_session_to_context,
+)
+from context_async_sqlalchemy.leaks import _CONNECTIONS_KEY
+from tests.helpers import ConnectionFactory
+
+
+def _make_session_mock() -> MagicMock:
+    session = MagicMock()
+    session.info = {}
+    session.in_transaction.return_value = True
+    session.commit = AsyncMock()
+    session.invalidate = AsyncMock()
+
+    async def close() -> None:
+        session.in_transaction.return_value = False
+
+    session.close = AsyncMock(side_effect=close)
+    return session
+
+
+async def test_cancellation_waits_for_finalization(
+    make_connection: ConnectionFactory,
+) -> None:
+    session = _make_session_mock()
+    committed = asyncio.Event()
+
+    async def slow_commit() -> None:
+        await asyncio.sleep(0.05)
+        committed.set()
+
+    session.commit.side_effect = slow_commit
+
+    async def request() -> None:
+        token = init_db_session_ctx()
+        put_db_session_to_context(make_connection(), session)
+        await finalize_db_session_ctx(token, commit_all_sessions)
+
+    task = asyncio.ensure_future(request())
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert committed.is_set()
+    session.close.assert_awaited_once()
+
+
+async def test_stuck_finalization_invalidates_connections(
+    make_connection: ConnectionFactory,
+) -> None:
+    session = _make_session_mock()
+    session.commit.side_effect = asyncio.Event().wait
+    connection = MagicMock()
+    session.info[_CONNECTIONS_KEY] = [connection]
+    leaked = leaked_sessions_count()
+
+    token = init_db_session_ctx()
+    put_db_session_to_context(
+        make_connection(finalization_timeout=0.05), session
+    )
+
+    with pytest.raises(asyncio.TimeoutError):
+        await finalize_db_session_ctx(token, commit_all_sessions)
+    connection.invalidate.assert_called_once()
+    assert leaked_sessions_count() == leaked + 1
+
+
+async def test_unclosed_sessions_are_invalidated(
+    make_connection: ConnectionFactory,
+) -> None:
+    failed, unclosed = _make_session_mock(), _make_session_mock()
+    failed.close.side_effect = ValueError("close failed")
+    leaked = leaked_sessions_count()
+
+    token = init_db_session_ctx()
+    put_db_session_to_context(make_connection(), failed)
+    put_db_session_to_context(make_connection(), unclosed)
+
+    with pytest.raises(ValueError, match="close failed"):
+        await finalize_db_session_ctx(token)
+    unclosed.invalidate.assert_awaited_once()
+    assert leaked_sessions_count() == leaked + 2
+
+
+async def test_connections_are_released(
+    make_connection: ConnectionFactory,
+) -> None:
+    connect = make_connection(finalization_timeout=1)
+    leaked = leaked_sessions_count()
+    token = init_db_session_ctx()
+    session = await db_session(connect)
+    await session.execute(text("SELECT 1"))
+    assert session.info[_CONNECTIONS_KEY]
+
+    await finalize_db_session_ctx(token, commit_all_sessions)
+
+    assert _CONNECTIONS_KEY not in session.info
+    assert leaked_sessions_count() == leaked
+
+
+async def test_pooled_session_is_not_swept_from_another_request(
+    make_connection: ConnectionFactory,
+) -> None:
+    connect = make_connection(session_pool_size=1)
+    leaked = leaked_sessions_count()
+    other_sessions: list[AsyncSession] = []
+    other_requests: list[asyncio.Future[None]] = []
+
+    async def other_request() -> None:
+        # Takes the pooled session and starts a transaction right away
+        session = await connect.create_session()
+        session.sync_session.begin()
+        other_sessions.append(session)
+
+    release_session = connect.release_session
+
+    def release_and_reuse(session: AsyncSession) -> None:
+        release_session(session)
+        other_requests.append(asyncio.ensure_future(other_request()))
+
+    connect.release_session = release_and_reuse  # type: ignore[method-assign]
+    token = init_db_session_ctx()
+    session = await db_session(connect)
+    await session.execute(text("SELECT 1"))
+
+    await finalize_db_session_ctx(token, commit_all_sessions)
+    await asyncio.gather(*other_requests)
+
+    (other,) = other_sessions
+    assert other is session
+    assert other.in_transaction()
+    assert leaked_sessions_count() == leaked
+    await other.close()
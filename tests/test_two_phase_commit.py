@@ -0,0 +1,100 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    commit_all_sessions,
+    init_db_session_ctx,
+    put_db_session_to_context,
+    reset_db_session_ctx,
+)
+
+
+def _make_session_mock(name: str, order: list[str]) -> MagicMock:
+    session = MagicMock()
+    session.commit = AsyncMock(
+        side_effect=lambda: order.append(f"commit {name}")
+    )
+    session.rollback = AsyncMock()
+    session.close = AsyncMock()
+    session.run_sync = AsyncMock(
+        side_effect=lambda _: order.append(f"prepare {name}")
+    )
+    session.in_transaction.return_value = True
+    session.sync_session.twophase = True
+    return session
+
+
+def _put_sessions(order: list[str], *names: str) -> list[MagicMock]:
+    sessions = []
+    for name in names:
+        connection = DBConnect(
+            engine_creator=MagicMock(), session_maker_creator=MagicMock()
+        )
+        session = _make_session_mock(name, order)
+        put_db_session_to_context(connection, session)
+        sessions.append(session)
+    return sessions
+
+
+async def test_prepares_all_before_commit() -> None:
+    order: list[str] = []
+    token = init_db_session_ctx()
+    _put_sessions(order, "first", "second")
+
+    async def before_commit(session: AsyncSession) -> None:
+        order.append("before_commit")
+
+    await commit_all_sessions(before_commit=before_commit, two_phase=True)
+
+    assert order == [
+        "before_commit",
+        "before_commit",
+        "prepare first",
+        "prepare second",
+        "commit first",
+        "commit second",
+    ]
+    await reset_db_session_ctx(token)
+
+
+async def test_nothing_committed_if_prepare_fails() -> None:
+    order: list[str] = []
+    token = init_db_session_ctx()
+    first, second = _put_sessions(order, "first", "second")
+    second.run_sync.side_effect = RuntimeError("prepare failed")
+
+    with pytest.raises(RuntimeError, match="prepare failed"):
+        await commit_all_sessions(two_phase=True)
+
+    first.commit.assert_not_awaited()
+    second.commit.assert_not_awaited()
+    await reset_db_session_ctx(token)
+
+
+async def test_single_transaction_is_committed_without_prepare() -> None:
+    order: list[str] = []
+    token = init_db_session_ctx()
+    _, idle = _put_sessions(order, "first", "idle")
+    idle.in_transaction.return_value = False
+
+    await commit_all_sessions(two_phase=True)
+
+    assert order == ["commit first"]
+    await reset_db_session_ctx(token)
+
+
+async def test_requires_twophase_sessions() -> None:
+    order: list[str] = []
+    token = init_db_session_ctx()
+    first, _ = _put_sessions(order, "first", "second")
+    first.sync_session.twophase = False
+
+    with pytest.raises(InvalidRequestError):
+        await commit_all_sessions(two_phase=True)
+
+    assert order == []
+    await reset_db_session_ctx(token)
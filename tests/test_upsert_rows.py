@@ -0,0 +1,130 @@
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Any
+
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from context_async_sqlalchemy import (
+    DBConnect,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+    session_has_writes,
+    upsert_rows,
+    upsert_rows_returning,
+)
+from tests.helpers import ConnectionFactory, engine_of, record_statements
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "upsert_item"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    text: Mapped[str | None]
+
+
+@pytest_asyncio.fixture
+async def upsert_ctx(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, list[str]]]:
+    connection = make_connection(skip_commit_without_writes=True)
+    engine = await engine_of(connection)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    token = init_db_session_ctx()
+    session = await db_session(connection)
+    statements = await record_statements(connection)
+
+    yield connection, statements
+
+    await session.rollback()
+    await reset_db_session_ctx(token)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+
+async def test_rows_are_inserted_and_updated(
+    upsert_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = upsert_ctx
+    session = await db_session(connection)
+    ids = [1, 2, 3]
+
+    inserted = [{"id": id_, "text": "upsert"} for id_ in ids[:2]]
+    assert await upsert_rows(session, Item, inserted, ["id"]) == 2
+    upserted = [{"id": id_, "text": "upserted"} for id_ in ids]
+    assert await upsert_rows(session, Item, upserted, ["id"]) == 3
+
+    texts = await session.scalars(select(Item.text).where(Item.id.in_(ids)))
+    assert list(texts) == ["upserted"] * 3
+    assert session_has_writes(session)
+
+
+async def test_conflicts_are_skipped_without_update_columns(
+    upsert_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = upsert_ctx
+    session = await db_session(connection)
+    id_ = 1
+    await upsert_rows(session, Item, [{"id": id_, "text": "upsert"}], ["id"])
+
+    await upsert_rows(
+        session,
+        Item,
+        [{"id": id_, "text": "upserted"}],
+        ["id"],
+        update_columns=[],
+    )
+
+    assert (
+        await session.scalar(select(Item.text).where(Item.id == id_))
+        == "upsert"
+    )
+
+
+async def test_rows_are_written_in_chunks(
+    upsert_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = upsert_ctx
+    session = await db_session(connection)
+
+    async def rows() -> AsyncIterator[dict[str, Any]]:
+        for id_ in range(5):
+            yield {"id": id_, "text": "upsert"}
+
+    statements.clear()
+    count = await upsert_rows(session, Item, rows(), ["id"], chunk_size=2)
+
+    assert count == 5
+    assert len([s for s in statements if "ON CONFLICT" in s]) == 3
+
+
+async def test_returning_rows_are_streamed(
+    upsert_ctx: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = upsert_ctx
+    session = await db_session(connection)
+    ids = list(range(5))
+    rows = [{"id": id_, "text": "upsert"} for id_ in ids]
+
+    statements.clear()
+    returned = [
+        row
+        async for row in upsert_rows_returning(
+            session,
+            Item.__table__,
+            rows,
+            ["id"],
+            returning=["id", "text"],
+            chunk_size=2,
+        )
+    ]
+
+    assert sorted(row.id for row in returned) == sorted(ids)
+    assert {row.text for row in returned} == {"upsert"}
+    assert len([s for s in statements if "RETURNING" in s]) == 3
@@ -0,0 +1,107 @@
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from context_async_sqlalchemy import DBConnect, write_in_chunks
+from tests.helpers import ConnectionFactory, engine_of, record_statements
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "chunked_item"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    text: Mapped[str | None]
+
+
+@pytest_asyncio.fixture
+async def chunked_connection(
+    make_connection: ConnectionFactory,
+) -> AsyncGenerator[tuple[DBConnect, list[str]]]:
+    connection = make_connection()
+    engine = await engine_of(connection)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = await connection.create_session()
+    session.add_all(Item(id=i, text="new") for i in range(10))
+    await session.commit()
+    await session.close()
+
+    statements = await record_statements(connection)
+    yield connection, statements
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+
+async def _texts(connection: DBConnect) -> list[str | None]:
+    session = await connection.create_session()
+    try:
+        return list(await session.scalars(select(Item.text).order_by(Item.id)))
+    finally:
+        await session.close()
+
+
+async def test_rows_are_updated_in_chunks(
+    chunked_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, statements = chunked_connection
+    reported: list[tuple[int, Any]] = []
+
+    count = await write_in_chunks(
+        connection,
+        update(Item).values(text="old"),
+        Item.id,
+        chunk_size=3,
+        progress=lambda rows, key: reported.append((rows, key)),
+    )
+
+    assert count == 10
+    assert reported == [(3, 2), (6, 5), (9, 8), (10, None)]
+    assert len([s for s in statements if s.startswith("UPDATE")]) == 4
+    assert await _texts(connection) == ["old"] * 10
+
+
+async def test_chunks_follow_the_criteria(
+    chunked_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = chunked_connection
+    reported: list[tuple[int, Any]] = []
+
+    count = await write_in_chunks(
+        connection,
+        delete(Item).where(Item.id % 2 == 0),
+        Item.id,
+        chunk_size=2,
+        progress=lambda rows, key: reported.append((rows, key)),
+    )
+
+    assert count == 5
+    assert reported == [(2, 2), (4, 6), (5, None)]
+    session = await connection.create_session()
+    ids = await session.scalars(select(Item.id).order_by(Item.id))
+    assert list(ids) == [1, 3, 5, 7, 9]
+    await session.close()
+
+
+async def test_committed_chunks_stay_after_a_failure(
+    chunked_connection: tuple[DBConnect, list[str]],
+) -> None:
+    connection, _ = chunked_connection
+    # The third chunk divides by zero
+    statement = update(Item).values(text=func.concat("old", 1 / (7 - Item.id)))
+
+    with pytest.raises(DBAPIError, match="division by zero"):
+        await write_in_chunks(connection, statement, Item.id, chunk_size=3)
+
+    texts = await _texts(connection)
+    assert "new" not in texts[:6]
+    assert texts[6:] == ["new"] * 4
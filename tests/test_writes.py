@@ -0,0 +1,180 @@
+import uuid
+from collections.abc import AsyncGenerator
+from unittest.mock import AsyncMock
+
+import pytest_asyncio
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from context_async_sqlalchemy import (
+    ANY_TABLE,
+    READ_STATEMENT,
+    DBConnect,
+    commit_all_sessions,
+    db_session,
+    init_db_session_ctx,
+    reset_db_session_ctx,
+    session_has_writes,
+    written_tables,
+)
+from examples.models import ExampleTable
+from tests.helpers import ConnectionFactory
+
+
+@pytest_asyncio.fixture
+async def tracked_connection(make_connection: ConnectionFactory) -> DBConnect:
+    return make_connection(skip_commit_without_writes=True)
+
+
+@pytest_asyncio.fixture
+async def tracked_session(
+    tracked_connection: DBConnect,
+) -> AsyncGenerator[AsyncSession]:
+    session = await tracked_connection.create_session()
+    yield session
+    await session.rollback()
+    await session.close()
+
+
+async def test_reads_are_not_writes(tracked_session: AsyncSession) -> None:
+    await tracked_session.execute(select(ExampleTable))
+    await tracked_session.get(ExampleTable, uuid.uuid4())
+
+    assert not session_has_writes(tracked_session)
+    assert written_tables(tracked_session) == set()
+
+
+async def test_dml_statement(tracked_session: AsyncSession) -> None:
+    await tracked_session.execute(insert(ExampleTable).values(text="w"))
+
+    assert written_tables(tracked_session) == {"example"}
+
+
+async def test_orm_flush(tracked_session: AsyncSession) -> None:
+    row = ExampleTable(text="w")
+    tracked_session.add(row)
+    await tracked_session.flush()
+    assert written_tables(tracked_session) == {"example"}
+    await tracked_session.commit()
+
+    assert not session_has_writes(tracked_session)
+    await tracked_session.refresh(row)
+    await tracked_session.flush()
+    assert not session_has_writes(tracked_session)
+
+    row.text = "changed"
+    await tracked_session.flush()
+    assert written_tables(tracked_session) == {"example"}
+
+    await tracked_session.delete(row)
+    await tracked_session.commit()
+
+
+async def test_textual_sql_is_write(tracked_session: AsyncSession) -> None:
+    await tracked_session.execute(text("SELECT 1"))
+
+    assert written_tables(tracked_session) == {ANY_TABLE}
+
+
+async def test_rollback_resets_writes(
+    tracked_session: AsyncSession,
+) -> None:
+    await tracked_session.execute(
+        update(ExampleTable).values(text="w").where(ExampleTable.text == "-")
+    )
+    await tracked_session.rollback()
+
+    assert not session_has_writes(tracked_session)
+
+
+async def test_untracked_session_is_written(
+    make_connection: ConnectionFactory,
+) -> None:
+    connection = make_connection()
+    session = await connection.create_session()
+
+    assert written_tables(session) == {ANY_TABLE}
+
+
+async def test_commit_skipped_without_writes(
+    tracked_connection: DBConnect,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(tracked_connection)
+    await session.execute(select(ExampleTable))
+    before_commit = AsyncMock()
+
+    await commit_all_sessions(before_commit)
+
+    assert session.in_transaction()
+    before_commit.assert_not_awaited()
+    await reset_db_session_ctx(token)
+
+
+async def test_commit_with_writes(tracked_connection: DBConnect) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(tracked_connection)
+    await session.execute(
+        update(ExampleTable).values(text="w").where(ExampleTable.text == "-")
+    )
+    before_commit = AsyncMock()
+
+    await commit_all_sessions(before_commit)
+
+    assert not session.in_transaction()
+    before_commit.assert_awaited_once_with(session)
+    await reset_db_session_ctx(token)
+
+
+async def test_connection_statement(tracked_session: AsyncSession) -> None:
+    connection = await tracked_session.connection()
+    await connection.execute(
+        update(ExampleTable).values(text="w").where(ExampleTable.text == "-")
+    )
+
+    assert written_tables(tracked_session) == {"example"}
+
+
+async def test_driver_sql_is_write(tracked_session: AsyncSession) -> None:
+    connection = await tracked_session.connection()
+    await connection.exec_driver_sql("SELECT 1")
+
+    assert written_tables(tracked_session) == {ANY_TABLE}
+
+
+async def test_writes_after_savepoint(tracked_session: AsyncSession) -> None:
+    async with tracked_session.begin_nested():
+        await tracked_session.execute(select(ExampleTable))
+    await tracked_session.execute(
+        update(ExampleTable).values(text="w").where(ExampleTable.text == "-")
+    )
+
+    assert written_tables(tracked_session) == {"example"}
+
+
+async def test_commit_of_connection_writes(
+    tracked_connection: DBConnect,
+) -> None:
+    token = init_db_session_ctx()
+    session = await db_session(tracked_connection)
+    connection = await session.connection()
+    await connection.execute(
+        update(ExampleTable).values(text="w").where(ExampleTable.text == "-")
+    )
+
+    await commit_all_sessions()
+
+    assert not session.in_transaction()
+    await reset_db_session_ctx(token)
+
+
+async def test_marked_textual_read(tracked_session: AsyncSession) -> None:
+    await tracked_session.execute(
+        text("SELECT 1"), execution_options={READ_STATEMENT: True}
+    )
+    connection = await tracked_session.connection()
+    await connection.execute(
+        text("SELECT 2").execution_options(**{READ_STATEMENT: True})
+    )
+
+    assert not session_has_writes(tracked_session)